@@ -0,0 +1,154 @@
+"""
+Refreshes all the notebooks in _notebooks/ in a single build:
+    1. Runs the covid_helpers data pipeline once (download and modelling) for the notebooks
+        that will be executed, storing the results in the shared snapshot store
+        (COVID_HELPERS_SNAPSHOTS).
+    2. Executes the notebooks in parallel worker processes with papermill. The notebooks
+        read the stored results instead of downloading and modelling again.
+        The jupytext .py notebooks without an .ipynb are only executed with --py-notebooks.
+    3. Reports the time of each step, and the failed notebooks as GitHub Actions outputs.
+
+Usage: python _action_files/build_notebooks.py [--workers N] [--py-notebooks]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+NOTEBOOKS_DIR = Path(__file__).resolve().parent.parent / '_notebooks'
+SKIP_NOTEBOOKS = ['2020-03-16-covid19_growth_bayes.ipynb']
+
+# the notebooks (kernels) inherit the environment of this process
+os.environ['COVID_HELPERS_SNAPSHOTS'] = '1'
+
+
+def precompute_projections():
+    from covid_helpers import CovidData
+    CovidData().table_with_projections(debug_dfs=True, debug_format='long')
+
+
+def precompute_news():
+    from covid_helpers import CovidData
+    CovidData.at_offsets([0, -10], projection_days={0: [30], -10: [9]},
+                         debug_dfs=[0], debug_format='long')
+
+
+def precompute_micromorts():
+    from covid_helpers import CovidData
+    CovidData().table_with_current_rates_and_ratios()
+
+
+# the CovidData tables that the notebooks build on, called with the same arguments as in
+# the notebooks (the stored tables are keyed by them)
+PIPELINE_TABLES = {
+    '2020-03-29-covid19-progress-projections': precompute_projections,
+    '2020-06-12-covid19-news': precompute_news,
+    '2020-12-19-covid19-micromorts': precompute_micromorts,
+}
+
+
+def run_pipeline(notebooks):
+    """
+    calculates and stores the CovidData tables of the notebooks that will be executed
+
+    :param notebooks: paths of the notebooks that will be executed
+    :return: names of the notebooks that the tables were calculated for
+    """
+    precomputed = [path.stem for path in notebooks if path.stem in PIPELINE_TABLES]
+    if not precomputed:
+        return precomputed
+    sys.path.insert(0, str(NOTEBOOKS_DIR))
+    cwd = os.getcwd()
+    os.chdir(NOTEBOOKS_DIR)
+    try:
+        for name in precomputed:
+            PIPELINE_TABLES[name]()
+    finally:
+        os.chdir(cwd)
+        sys.path.pop(0)
+    return precomputed
+
+
+def notebooks_to_execute(py_notebooks=False):
+    """
+    :param py_notebooks: also create .ipynb notebooks from the jupytext paired .py
+        notebooks that don't have their .ipynb in the folder (they are then executed,
+        and converted to posts as well)
+    :return: paths of the .ipynb notebooks
+    """
+    if py_notebooks:
+        for path in sorted(NOTEBOOKS_DIR.glob('20*.py')):
+            ipynb_path = path.with_suffix('.ipynb')
+            if not ipynb_path.exists() and 'jupytext:' in path.read_text()[:1000]:
+                import jupytext
+                jupytext.write(jupytext.read(path), ipynb_path)
+    return [p for p in sorted(NOTEBOOKS_DIR.glob('*.ipynb')) if p.name not in SKIP_NOTEBOOKS]
+
+
+def execute_notebook(path):
+    """ :return: tuple of notebook file name, seconds, and error (None if successful) """
+    import papermill
+    start = time.perf_counter()
+    try:
+        papermill.execute_notebook(str(path), str(path), kernel_name='python3',
+                                   cwd=str(NOTEBOOKS_DIR), progress_bar=False)
+        error = None
+    except Exception as e:
+        error = e
+    return path.name, time.perf_counter() - start, error
+
+
+def set_output(name, value):
+    print(f'::set-output name={name}::{value}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of notebooks to execute in parallel')
+    parser.add_argument('--py-notebooks', action='store_true',
+                        help='also execute (and publish) the jupytext .py notebooks that '
+                             "don't have an .ipynb, by creating it")
+    args = parser.parse_args(argv)
+
+    build_start = time.perf_counter()
+    timings = {}
+
+    notebooks = notebooks_to_execute(py_notebooks=args.py_notebooks)
+
+    start = time.perf_counter()
+    try:
+        run_pipeline(notebooks)
+    except Exception as e:
+        # the notebooks will fail or calculate on their own, and will be reported
+        print(f'ERROR running the data pipeline: {e!r}')
+    timings['data pipeline'] = time.perf_counter() - start
+    errors = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(execute_notebook, path) for path in notebooks]
+        for future in as_completed(futures):
+            name, seconds, error = future.result()
+            timings[name] = seconds
+            if error is None:
+                print(f'Sucessfully refreshed {name} ({seconds:.1f}s)')
+            else:
+                print(f'ERROR Refreshing {name}: {error!r}')
+                errors.append(name)
+
+    timings['total build'] = time.perf_counter() - build_start
+    print('\nBuild timings:')
+    for name, seconds in timings.items():
+        print(f'{seconds:>10.1f}s  {name}')
+
+    # emit errors if exist so downstream task can open an issue
+    set_output('error_bool', 'true' if errors else 'false')
+    if errors:
+        print(f'These files failed to update properly: {", ".join(errors)}')
+        set_output('error_str', ', ' + ', '.join(errors))
+
+
+if __name__ == '__main__':
+    main()
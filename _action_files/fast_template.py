@@ -25,5 +25,5 @@ def rename_for_jekyll(nb_path: Path, warnings: Set[Tuple[str, str]]=None) -> str
         dtnm = datetime.fromtimestamp(mdate).strftime("%Y-%m-%d-") + clean_name
         assert _re_blog_date.match(dtnm), f'{dtnm} is not a valid name, filename must be pre-pended with YYYY-MM-DD-'
         # push this into a set b/c _nb2htmlfname gets called multiple times per conversion
-        if warnings: warnings.add((nb_path, dtnm))
+        if warnings is not None: warnings.add((nb_path, dtnm))
         return dtnm
@@ -1,22 +1,62 @@
 """Converts Jupyter Notebooks to Jekyll compliant blog posts"""
 from datetime import datetime
-import re, os, logging
+from concurrent.futures import ProcessPoolExecutor
+import re, os, logging, hashlib, json
 from nbdev import export2html
 from nbdev.export2html import Config, Path, _re_digits, _to_html, _re_block_notes
 from fast_template import rename_for_jekyll
 
+NB_GLOB = '_notebooks/*.ipynb'
+DEST = '_posts/'
+TEMPLATE = '/fastpages/fastpages.tpl'
+# content hashes of converted notebooks, unchanged notebooks are not converted again
+MANIFEST = os.path.join(DEST, '.nb2post_manifest.json')
+
 warnings = set()
-    
+
 # Modify the naming process such that destination files get named properly for Jekyll _posts
-def _nb2htmlfname(nb_path, dest=None): 
+def _nb2htmlfname(nb_path, dest=None):
     fname = rename_for_jekyll(nb_path, warnings=warnings)
     if dest is None: dest = Config().doc_path
     return Path(dest)/fname
 
-# TODO: Open a GitHub Issue in addition to printing warnings
-for original, new in warnings:
-    print(f'{original} has been renamed to {new} to be complaint with Jekyll naming conventions.\n')
-    
-## apply monkey patches
+## apply monkey patches (at import, so that they're also applied in the worker processes)
 export2html._nb2htmlfname = _nb2htmlfname
-export2html.notebook2html(fname='_notebooks/*.ipynb', dest='_posts/', template_file='/fastpages/fastpages.tpl')
+
+def _file_hash(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+def _convert(nb_path):
+    "Converts a single notebook, returns the renaming warnings collected in this worker"
+    warnings.clear()
+    export2html.notebook2html(fname=str(nb_path), dest=DEST, template_file=TEMPLATE)
+    return set(warnings)
+
+def _load_manifest():
+    try:
+        with open(MANIFEST) as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+if __name__ == '__main__':
+    manifest = _load_manifest()
+    template_hash = _file_hash(TEMPLATE) if os.path.exists(TEMPLATE) else ''
+    # same notebook source and outputs, template and destination name -> skip
+    keys = {nb_path: [_file_hash(nb_path), template_hash, _nb2htmlfname(nb_path, dest=DEST).name]
+            for nb_path in sorted(Path('.').glob(NB_GLOB))}
+    to_convert = [nb_path for nb_path, key in keys.items()
+                  if manifest.get(str(nb_path)) != key or not (Path(DEST)/key[2]).exists()]
+    print(f'Converting {len(to_convert)} changed notebooks out of {len(keys)}.')
+
+    warnings.clear()  # only report renames of the converted notebooks
+    with ProcessPoolExecutor() as pool:
+        for nb_path, nb_warnings in zip(to_convert, pool.map(_convert, to_convert)):
+            warnings.update(nb_warnings)
+            manifest[str(nb_path)] = keys[nb_path]
+
+    # TODO: Open a GitHub Issue in addition to printing warnings
+    for original, new in warnings:
+        print(f'{original} has been renamed to {new} to be complaint with Jekyll naming conventions.\n')
+
+    manifest = {nb: key for nb, key in manifest.items() if Path(nb) in keys}
+    os.makedirs(DEST, exist_ok=True)
+    with open(MANIFEST, 'w') as f: json.dump(manifest, f, indent=1)
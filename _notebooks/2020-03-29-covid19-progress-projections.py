@@ -36,7 +36,7 @@ import covid_helpers
 
 covid_data = covid_helpers.CovidData()
 stylers = covid_helpers.PandasStyling
-df_all, debug_dfs = covid_data.table_with_projections(debug_dfs=True)
+df_all, df_alt = covid_data.table_with_projections(debug_dfs=True, debug_format='long')
 df = covid_data.filter_df(df_all)
 df.columns
 # -
@@ -48,22 +48,28 @@ Markdown(f"*Based on data up to*: ***{covid_data.cur_date}***")
 #hide
 geo_helper = covid_helpers.GeoMap
 df_geo = geo_helper.make_geo_df(df_all, cases_filter=1000, deaths_filter=20)
-def hover_text_func(r: pd.Series):
-    return (
+# hover values are sent once, and formatted by the browser
+hover = covid_helpers.MapHover(
+    df_geo,
+    columns=['Cases.total', 'Cases.new', 'Cases.total.est', 'Cases.new.est', 'affected_ratio.est',
+             'transmission_rate', 'transmission_rate_std', 'Deaths.total', 'Deaths.new',
+             'affected_ratio.est.+14d.err', 'affected_ratio.est.+30d.err',
+             'needICU.per100k.+14d.err', 'needICU.per100k.+30d.err'],
+    default_template=(
         "<br>"
-        f"Cases (reported): {r['Cases.total']:,.0f} (+<b>{r['Cases.new']:,.0f}</b>)<br>"
-        f"Cases (estimated): {r['Cases.total.est']:,.0f} (+<b>{r['Cases.new.est']:,.0f}</b>)<br>"
-        f"Affected percent: <b>{r['affected_ratio.est']:.1%}</b><br>"
-        f"Transmission rate: <b>{r['transmission_rate']:.1%}</b> ± {r['transmission_rate_std']:.1%}<br>"
-        f"Deaths: {r['Deaths.total']:,.0f} (+<b>{r['Deaths.new']:,.0f}</b>)<br>"
-    )
+        "Cases (reported): {Cases.total:,.0f} (+<b>{Cases.new:,.0f}</b>)<br>"
+        "Cases (estimated): {Cases.total.est:,.0f} (+<b>{Cases.new.est:,.0f}</b>)<br>"
+        "Affected percent: <b>{affected_ratio.est:.1%}</b><br>"
+        "Transmission rate: <b>{transmission_rate:.1%}</b> ± {transmission_rate_std:.1%}<br>"
+        "Deaths: {Deaths.total:,.0f} (+<b>{Deaths.new:,.0f}</b>)<br>"
+    ))
 fig = geo_helper.make_map_figure(
     df_geo,
     col='transmission_rate',
     err_col='transmission_rate_std',
     colorbar_title='%',
     subtitle='Transmission rate: red spreading (>5%), blue recovering (<5%)',
-    hover_text_func=hover_text_func,
+    hover=hover,
     scale_max=10,
     colorscale='Bluered',
 )
@@ -74,38 +80,40 @@ df_geo['affected_ratio.change.monthly.rate'] = (df_geo['affected_ratio.est.+7d']
 df_geo['icu_estimation_error'] = df_geo['needICU.per100k'] / df_geo['owid_icu_per_100k']
 
 #hide_input
+import functools
+button_dict = functools.partial(geo_helper.button_dict, hover=hover)
 fig.update_layout(
     updatemenus=[
         dict(
             buttons=[
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['transmission_rate'], 'Transmission rate<br>percent (blue-red)',
                     colorscale='Bluered', scale_max=10, percent=True,
                     subtitle='Transmission rate: red spreading (>5%), blue recovering (<5%)',
                     colorbar_title='%',
                     err_series=df_geo['transmission_rate_std']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['transmission_rate'], 'Transmission rate<br>percent',
                     colorscale='YlOrRd', scale_max=33, percent=True,
                     subtitle='Transmission rate (related to R0)',
                     colorbar_title='%',
                     err_series=df_geo['transmission_rate_std']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.new.per100k.est'], 'Recent cases<br>estimated per 100k',
                     colorscale='YlOrRd',
                     colorbar_title='Cases / 100k',
                     subtitle='Estimated recent cases in last 5 days per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.new.est'], 'Recent cases<br>(estimated)',
                     colorscale='YlOrRd',
                     colorbar_title='Cases',
                     subtitle='Estimated recent cases in last 5 days'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.new.per100k'], 'Recent cases<br>reported per 100k',
                     colorscale='YlOrRd',
                     colorbar_title='Cases / 100k',
                     subtitle='Reported recent cases in last 5 days per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.new'], 'Recent cases<br>(reported)',
                     colorscale='YlOrRd',
                     colorbar_title='Cases',
@@ -116,50 +124,50 @@ fig.update_layout(
             showactive=False, x=0.07, xanchor="left", y=1.1, yanchor="top"),
         dict(
             buttons=[
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['affected_ratio.est'], 'Affected percent<br>(Current)',
                     colorscale='Bluyl', percent=True,
                     colorbar_title='%',
                     subtitle='Estimated current affected population percentage'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['owid_vaccination_ratio'], 'Vaccination<br>percent',
                     colorscale='Blues', scale_max=None, percent=True,
                     colorbar_title='%',
                     subtitle='Latest reported vaccination percent (OWID)'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['affected_ratio.est.+14d'], 'Affected percent<br>(in 14 days)',
                     colorscale='Bluyl', scale_max=25, percent=True,
                     colorbar_title='%',
                     subtitle='Projected affected population percentage in 14 days',
                     err_series=df_geo['affected_ratio.est.+14d.err']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['affected_ratio.est.+30d'], 'Affected percent<br>(in 30 days)',
                     colorscale='Bluyl', scale_max=25, percent=True,
                     colorbar_title='%',
                     subtitle='Projected affected population percentage in 30 days',
                     err_series=df_geo['affected_ratio.est.+30d.err']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['affected_ratio.change.monthly.rate'],
                     title='Affected percent<br>montly change rate',
                     colorscale='Bluyl', scale_max=10, percent=True,
                     colorbar_title='% per month',
                     subtitle='Current affected population percentage monthly change rate',
                     err_series=df_geo['affected_ratio.est.+30d.err']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.total.per100k.est'], 'Total cases<br>estimated per 100k',
                     colorscale='YlOrRd',
                     colorbar_title='Cases / 100k',
                     subtitle='Estimated total cases per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.total.est'], 'Total cases<br>(estimated)', colorscale='YlOrRd',
                     colorbar_title='Cases',
                     subtitle='Estimated total cases'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.total.per100k'], 'Total cases<br>reported per 100k',
                     colorscale='YlOrRd',
                     colorbar_title='Cases / 100k',
                     subtitle='Reported total cases per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Cases.total'], 'Total cases<br>(reported)', colorscale='YlOrRd',
                     colorbar_title='Cases',
                     subtitle='Reported total cases'),
@@ -169,34 +177,34 @@ fig.update_layout(
             showactive=False, x=0.305, xanchor="left", y=1.1, yanchor="top"),
         dict(
             buttons=[
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['needICU.per100k'], 'ICU need<br>(estimated)',
                     colorscale='Sunsetdark', scale_max=10,
                     colorbar_title='ICU beds / 100k',
                     subtitle='Estimated current ICU need per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['owid_icu_per_100k'], 'ICU need<br>(reported)',
                     colorscale='Sunsetdark', scale_max=10,
                     colorbar_title='ICU beds / 100k',
                     subtitle='Latest reported ICU need per 100k population (OWID)'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['icu_estimation_error'], 'ICU estimation<br>error',
                     colorscale='Bluered', scale_max=200, percent=True,
                     colorbar_title='%',
                     subtitle='Ratio between estimated and latest reported ICU need as %'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['needICU.per100k.+14d'],  'ICU need<br>(in 14 days)',
                     colorscale='Sunsetdark', scale_max=10,
                     colorbar_title='ICU beds / 100k',
                     subtitle='Projected ICU need per 100k population in 14 days',
                     err_series=df_geo['needICU.per100k.+14d.err']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['needICU.per100k.+30d'],  'ICU need<br>(in 30 days)',
                     colorscale='Sunsetdark', scale_max=10,
                     colorbar_title='ICU beds / 100k',
                     subtitle='Projected ICU need per 100k population in 30 days',
                     err_series=df_geo['needICU.per100k.+30d.err']),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['icu_capacity_per100k'], 'Pre-COVID<br>ICU Capacity',
                     colorbar_title='ICU beds / 100k',
                     colorscale='Blues',
@@ -207,23 +215,23 @@ fig.update_layout(
             showactive=False, x=0.54, xanchor="left", y=1.1, yanchor="top"),
         dict(
             buttons=[
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Deaths.total.per100k'], 'Deaths<br>per 100k', colorscale='Reds',
                     colorbar_title='Deaths / 100k',
                     subtitle='Total deaths per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Deaths.total'], 'Deaths<br>Total', colorscale='Reds',
                     colorbar_title='Deaths',
                     subtitle='Total deaths'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Deaths.new.per100k'], 'Recent deaths<br>per 100k', colorscale='Reds',
                     colorbar_title='Deaths / 100k',
                     subtitle='Recent deaths in last 5 days per 100k population'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['Deaths.new'], 'Recent deaths<br>total', colorscale='Reds',
                     colorbar_title='Deaths',
                     subtitle='Recent deaths in last 5 days'),
-                geo_helper.button_dict(
+                button_dict(
                     df_geo['current_testing_bias'], 'Current testing<br>bias',
                     colorscale='YlOrRd', scale_max=20, percent=False,
                     colorbar_title='Testing bias',
@@ -307,7 +315,6 @@ style_icu_table(df[(df['transmission_rate'] < 0.05) & (df['needICU.per100k'] > 0
 # > Tip: Choose a country from the drop-down menu to see the calculations used in the tables above and the dynamics of the model.
 
 #hide_input
-df_alt = pd.concat([d.reset_index() for d in debug_dfs], axis=0)
 df_alt_filt = df_alt[(df_alt['day'] > -120) & (df_alt['country'].isin(df.index))]
 covid_helpers.altair_sir_plot(df_alt_filt, df['Deaths.new.per100k'].idxmax())
 
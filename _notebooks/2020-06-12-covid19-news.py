@@ -39,18 +39,19 @@ stylers = covid_helpers.PandasStyling
 #hide
 day_diff = 10
 
-cur_data = covid_helpers.CovidData()
-df_cur_all, debug_dfs = cur_data.table_with_projections(projection_days=[30], debug_dfs=True)
-df_cur = cur_data.filter_df(df_cur_all)
-
-past_data = covid_helpers.CovidData(-day_diff)
-df_past = past_data.filter_df(past_data.table_with_projections(projection_days=[day_diff-1]))
+CovidData = covid_helpers.CovidData
+tables = CovidData.at_offsets([0, -day_diff],
+                              projection_days={0: [30], -day_diff: [day_diff-1]},
+                              debug_dfs=[0], debug_format='long')
+df_cur_all, df_alt_all = tables[0]
+df_cur = CovidData.filter_df(df_cur_all)
+df_past = CovidData.filter_df(tables[-day_diff])
 # -
 
 #hide_input
 from IPython.display import Markdown
-past_date = pd.to_datetime(past_data.dt_cols[-1]).date().isoformat()
-Markdown(f"***Based on data up to: {cur_data.cur_date}. \
+past_date = pd.to_datetime(CovidData(-day_diff).dt_cols[-1]).date().isoformat()
+Markdown(f"***Based on data up to: {CovidData.cur_date}. \
             Compared to ({day_diff} days before): {past_date}***")
 
 
@@ -136,7 +137,6 @@ style_news_infections(df_data.loc[new_waves])
 
 # +
 # hide
-df_alt_all = pd.concat([d.reset_index() for d in debug_dfs], axis=0)
 def infected_plots(countries, title):
     return covid_helpers.altair_multiple_countries_infected(
         df_alt_all, countries=countries, title=title, marker_day=day_diff)
@@ -339,8 +339,8 @@ infected_plots(not_active, "Continuosly inactive countries (now and 10 days ago)
 # hide
 def style_death_burden(df):
     cols = {
-        'Deaths.new.per100k': f'<i>Current</i>:<br>{cur_data.PREV_LAG} day<br>death<br>burden<br>per 100k',
-        'Deaths.new.per100k.past': f'<i>{day_diff} days ago</i>:<br>{cur_data.PREV_LAG} day<br>death<br>burden<br>per 100k',
+        'Deaths.new.per100k': f'<i>Current</i>:<br>{CovidData.PREV_LAG} day<br>death<br>burden<br>per 100k',
+        'Deaths.new.per100k.past': f'<i>{day_diff} days ago</i>:<br>{CovidData.PREV_LAG} day<br>death<br>burden<br>per 100k',
         'Deaths.total.diff': f'New<br>reported deaths<br>since {day_diff}<br>days ago',
         'needICU.per100k': 'Estimated<br>current<br>ICU need<br>per 100k<br>population',
         'affected_ratio.est': 'Estimated <br><i>total</i><br>affected<br>population<br>percentage',
@@ -428,8 +428,8 @@ df_alt_filt = df_alt_all[(df_alt_all['day'] > -60) &
 covid_helpers.altair_sir_plot(df_alt_filt, new_waves[0])
 
 #hide
-df_tot = df_alt_all.rename(columns={'country': cur_data.COL_REGION}
-                          ).set_index(cur_data.COL_REGION)
+df_tot = df_alt_all.rename(columns={'country': CovidData.COL_REGION}
+                          ).set_index(CovidData.COL_REGION)
 df_tot['population'] = df_cur_all['population']
 for c in df_tot.columns[df_alt_all.dtypes == float]:
     df_tot[c + '-total'] = df_tot[c] * df_tot['population']
@@ -460,7 +460,7 @@ days = 30
 df_tot = df_tot[df_tot['day'].between(-days, days) | (df_tot['day'] % 10 == 0)]
 
 # filter out noisy countries for actively infected plot:
-df_tot_filt = df_tot[df_tot[cur_data.COL_REGION].isin(df_cur.index.unique())]
+df_tot_filt = df_tot[df_tot[CovidData.COL_REGION].isin(df_cur.index.unique())]
 # -
 
 # ### World total estimated actively infected
@@ -480,7 +480,7 @@ max_y = (df_tot_filt[df_tot_filt['day'].between(-days, days)]
          .groupby('day')['Infected-total'].sum().max())
 stacked_inf = alt.Chart(df_tot_filt).mark_area().encode(
     x=alt.X('day:Q',
-            title=f'days relative to today ({cur_data.cur_date})',
+            title=f'days relative to today ({CovidData.cur_date})',
             scale=alt.Scale(domain=(-days, days))),
     y=alt.Y("Infected-total:Q", stack=True, title="Number of people",
            scale=alt.Scale(domain=(0, max_y))),
@@ -500,7 +500,7 @@ stacked_inf = alt.Chart(df_tot_filt).mark_area().encode(
 max_y = df_tot_filt[df_tot_filt['day']==days]['Removed-total'].sum()
 stacked_rem = alt.Chart(df_tot_filt).mark_area().encode(
     x=alt.X('day:Q',
-            title=f'days relative to today ({cur_data.cur_date})',
+            title=f'days relative to today ({CovidData.cur_date})',
             scale=alt.Scale(domain=(-days, days))),
     y=alt.Y("Removed-total:Q", stack=True, title="Number of people",
            scale=alt.Scale(domain=(0, max_y))),
@@ -101,59 +101,83 @@ df_geo = geo_helper.make_geo_df(df_all, cases_filter=1000, deaths_filter=20)
 
 # +
 #hide
-def micromorts_hover_func(r: pd.Series, age_range=None):    
+# risks comparable to one micromort (as multiples of it)
+comparable_risks = {
+    'km by Motorcycle': 10,
+    'km by Car': 370,
+    'km by Plane': 1600,
+    'scuba dives': 1 / 5,
+    'sky diving jumps': 1 / 8,
+    'base jumping jumps': 1 / 430,
+    'Everest climbs': 1 / 12000,
+}
+micromorts_cols = ([f'monthly_micromorts_{age_range}' for age_range in age_ifrs] +
+                   ['monthly_average_micromorts'])
+for col in micromorts_cols:
+    for risk, multiple in comparable_risks.items():
+        df_geo[f'{col}.{risk}'] = df_geo[col] * multiple
+        df_geo[f'{col}_err.{risk}'] = df_geo[f'{col}_err'] * multiple
+df_geo['current_susceptible_ratio'] = (
+    1 - df_geo['current_active_ratio'] - df_geo['current_recovered_ratio'])
+
+# hover values are sent once, and formatted by the browser
+hover = covid_helpers.MapHover(
+    df_geo,
+    columns=([f'{col}{err}.{risk}' for col in micromorts_cols
+              for err in ['', '_err'] for risk in comparable_risks] +
+             [f'{col}_err' for col in micromorts_cols] +
+             ['Cases.total', 'Cases.new', 'Cases.total.est', 'Cases.new.est',
+              'Deaths.total', 'Deaths.new', 'age_adjusted_ifr',
+              'current_active_ratio', 'current_susceptible_ratio',
+              'transmission_rate', 'transmission_rate_std',
+              'monthly_infection_chance', 'monthly_infection_chance_err',
+              'monthly_population_risk_err']))
+
+def micromorts_hover_template(age_range=None):
     if age_range is None:
-        ifr, ifr_str = r['age_adjusted_ifr'], "this country's age profile"
-        micromorts_col='monthly_average_micromorts'
+        ifr_template, ifr_str = '{age_adjusted_ifr:.2%}', "this country's age profile"
+        micromorts_col = 'monthly_average_micromorts'
     else:
-        ifr, ifr_str = age_ifrs[age_range], f'age range {age_range}'
-        micromorts_col=f'monthly_micromorts_{age_range}'
-    mm = r[micromorts_col]
-    err = r[f'{micromorts_col}_err']
+        ifr_template = covid_helpers.MapHover.escape(f'{age_ifrs[age_range]:.2%}')
+        ifr_str = covid_helpers.MapHover.escape(f'age range {age_range}')
+        micromorts_col = f'monthly_micromorts_{age_range}'
+    comparisons = ''.join(
+        f"  - <b>{{{micromorts_col}.{risk}:.0f}}</b> ± {{{micromorts_col}_err.{risk}:.0f}} "
+        f"{covid_helpers.MapHover.escape(risk)}<br>"
+        for risk in comparable_risks)
     return (
         f"<br>Risk of death due to one month<br>"
         f"of exposure is comparable to:<br>"
-        f"  - <b>{mm * 10:.0f}</b> ± {err * 10:.0f} km by Motorcycle<br>"
-        f"  - <b>{mm * 370:.0f}</b> ± {err * 370:.0f} km by Car<br>"
-        f"  - <b>{mm * 1600:.0f}</b> ± {err * 1600:.0f} km by Plane<br>"  
-        f"  - <b>{mm / 5:.0f}</b> ± {err / 5:.0f} scuba dives<br>"       
-        f"  - <b>{mm / 8:.0f}</b> ± {err / 8:.0f} sky diving jumps<br>"         
-        f"  - <b>{mm / 430:.0f}</b> ± {err / 430:.0f} base jumping jumps<br>"
-        f"  - <b>{mm / 12000:.0f}</b> ± {err / 12000:.0f} Everest climbs<br><br>"      
+        f"{comparisons}<br>"
         f"Contagious percent of population:"
-        f"  <b>{r['current_active_ratio']:.1%}</b><br>"
+        f"  <b>{{current_active_ratio:.1%}}</b><br>"
         f"Susceptible percent of population:"
-        f"  <b>{(1 - r['current_active_ratio'] - r['current_recovered_ratio']):.1%}</b><br>"
-        f"Transmission rate: <b>{r['transmission_rate']:.1%}</b> ± {r['transmission_rate_std']:.1%}<br>"
+        f"  <b>{{current_susceptible_ratio:.1%}}</b><br>"
+        f"Transmission rate: <b>{{transmission_rate:.1%}}</b> ± {{transmission_rate_std:.1%}}<br>"
         f"Chance of infection over a month:"
-        f"  <b>{r['monthly_infection_chance']:.1%}</b> ± {r['monthly_infection_chance_err']:.1%}<br>"
+        f"  <b>{{monthly_infection_chance:.1%}}</b> ± {{monthly_infection_chance_err:.1%}}<br>"
         f"Chance of death after infection<br> (for {ifr_str}):"
-        f"  <b>{ifr:.2%}</b>"
+        f"  <b>{ifr_template}</b>"
     )
 
-def micromorts_hover_texts_for_age_range(age_range):
-    return df_geo.apply(micromorts_hover_func, axis=1, age_range=age_range).tolist()
-
-def stats_hover_text_func(r: pd.Series):
-    return (
-        "<br>"
-        f"Cases (reported): {r['Cases.total']:,.0f} (+<b>{r['Cases.new']:,.0f}</b>)<br>"
-        f"Cases (estimated): {r['Cases.total.est']:,.0f} (+<b>{r['Cases.new.est']:,.0f}</b>)<br>"
-        f"Deaths: {r['Deaths.total']:,.0f} (+<b>{r['Deaths.new']:,.0f}</b>)<br><br>"
-        f"Contagious percent of population:"
-        f"  <b>{r['current_active_ratio']:.1%}</b><br>"
-        f"Susceptible percent of population:"
-        f"  <b>{(1 - r['current_active_ratio'] - r['current_recovered_ratio']):.1%}</b><br>"
-        f"Transmission rate: <b>{r['transmission_rate']:.1%}</b> ± {r['transmission_rate_std']:.1%}<br>"
-        f"Chance of infection over a month:"
-        f"  <b>{r['monthly_infection_chance']:.1%}</b><br>"
-    )
+stats_hover_template = (
+    "<br>"
+    "Cases (reported): {Cases.total:,.0f} (+<b>{Cases.new:,.0f}</b>)<br>"
+    "Cases (estimated): {Cases.total.est:,.0f} (+<b>{Cases.new.est:,.0f}</b>)<br>"
+    "Deaths: {Deaths.total:,.0f} (+<b>{Deaths.new:,.0f}</b>)<br><br>"
+    "Contagious percent of population:"
+    "  <b>{current_active_ratio:.1%}</b><br>"
+    "Susceptible percent of population:"
+    "  <b>{current_susceptible_ratio:.1%}</b><br>"
+    "Transmission rate: <b>{transmission_rate:.1%}</b> ± {transmission_rate_std:.1%}<br>"
+    "Chance of infection over a month:"
+    "  <b>{monthly_infection_chance:.1%}</b><br>"
+)
 
 
 # -
 
 #hide
-import functools
 default_age = '60-64'
 colorscale = 'RdPu'
 fig = geo_helper.make_map_figure(
@@ -161,7 +185,8 @@ fig = geo_helper.make_map_figure(
     col=f'monthly_micromorts_{default_age}',
     colorbar_title='Micromorts',
     subtitle=f"Ages {default_age}: risk of deadly infection due to a month's exposure",
-    hover_text_func=functools.partial(micromorts_hover_func, age_range=default_age),
+    hover=hover,
+    hover_template=micromorts_hover_template(default_age),
     scale_max=None,
     colorscale=colorscale,
     err_col=f'monthly_micromorts_{default_age}_err',
@@ -179,7 +204,7 @@ fig.update_layout(
                     colorscale=colorscale, scale_max=None, percent=False,
                     subtitle=f"Ages {age_range}: risk of deadly infection due to a month's exposure",
                     err_series=df_geo[f'monthly_micromorts_{age_range}_err'],
-                    hover_text_list=micromorts_hover_texts_for_age_range(age_range)
+                    hover=hover, hover_template=micromorts_hover_template(age_range)
                 ) 
                 for age_range in reversed(list(age_ifrs.keys()))
             ] + [
@@ -190,7 +215,7 @@ fig.update_layout(
                     colorscale=colorscale, scale_max=None, percent=False,
                     subtitle="Risk of deadly infection due to a month's exposure",
                     err_series=df_geo['monthly_average_micromorts_err'],
-                    hover_text_list=micromorts_hover_texts_for_age_range(None)
+                    hover=hover, hover_template=micromorts_hover_template(None)
                 ),
                 geo_helper.button_dict(
                     df_geo['monthly_infection_chance'],
@@ -199,13 +224,14 @@ fig.update_layout(
                     colorscale='Reds', scale_max=None, percent=True,
                     subtitle="Chance of being infected during a month's exposure",
                     err_series=df_geo['monthly_infection_chance_err'],
-                    hover_text_list=df_geo.apply(stats_hover_text_func, axis=1).tolist()
+                    hover=hover, hover_template=stats_hover_template
                 ),
                 geo_helper.button_dict(
                     df_geo['owid_vaccination_ratio'], '<b>Vaccination<br>percent</b>',
                     colorscale='Blues', scale_max=None, percent=True,
                     colorbar_title='%',
-                    subtitle='Latest reported vaccination percent (OWID)'),
+                    subtitle='Latest reported vaccination percent (OWID)',
+                    hover=hover, hover_template=stats_hover_template),
                 geo_helper.button_dict(
                     df_geo['monthly_population_risk'],
                     title='<b>Montly total population risk</b>',
@@ -213,7 +239,7 @@ fig.update_layout(
                     colorscale='amp', scale_max=None, percent=False,
                     subtitle="Total possible deaths due to a month's exposure",
                     err_series=df_geo['monthly_population_risk_err'],
-                    hover_text_list=df_geo.apply(stats_hover_text_func, axis=1).tolist()
+                    hover=hover, hover_template=stats_hover_template
                 ),
                 geo_helper.button_dict(
                     (df_geo['monthly_average_micromorts'] /
@@ -223,7 +249,7 @@ fig.update_layout(
                     colorscale='Bluered', scale_max=200, percent=True,
                     subtitle="Ratio of average monthly risk to recent deaths expressed as risk",
                     err_series=None,
-                    hover_text_list=df_geo.apply(stats_hover_text_func, axis=1).tolist()
+                    hover=hover, hover_template=stats_hover_template
                 ),
             ],
             direction="down", bgcolor='#dceae1',
@@ -0,0 +1,232 @@
+"""
+Offline benchmarks of the covid_helpers pipeline stages on synthetic JHU-shaped data.
+
+Usage (from the _notebooks folder):
+    python benchmark_covid_helpers.py --regions 200 --dates 500 --save-baseline bench.json
+    python benchmark_covid_helpers.py --regions 200 --dates 500 --compare bench.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('COVID_HELPERS_OFFLINE', '1')  # never download anything
+
+from covid_helpers import COL_REGION, CovidData, GeoMap, Instrumentation, Model, SourceData
+
+
+def synthetic_jhu_frames(n_regions=200, n_dates=500, province_fraction=0.1, n_provinces=3,
+                         seed=0):
+    """
+    Generates confirmed and deaths dataframes in the raw (wide) JHU layout: one row per
+    province / region with 'Province/State', 'Country/Region', 'Lat', 'Long' and a
+    column per date. Daily counts have reporting gaps and occasional corrections.
+
+    :param n_regions: number of regions (countries)
+    :param n_dates: number of dates
+    :param province_fraction: fraction of regions that are split into provinces
+    :param n_provinces: number of provinces (rows) of the split regions
+    :param seed: random seed
+    :return: tuple of confirmed and deaths dataframes
+    """
+    rng = np.random.default_rng(seed)
+
+    known = list(dict.fromkeys(SourceData.df_mappings['Country'].dropna()))
+    regions = (known + [f'Region {i}' for i in range(max(n_regions - len(known), 0))]
+               )[:n_regions]
+    split = rng.random(n_regions) < province_fraction
+    rows = [(np.nan if not is_split else f'Province {p}', region)
+            for region, is_split in zip(regions, split)
+            for p in range(n_provinces if is_split else 1)]
+    n_rows = len(rows)
+
+    starts = rng.integers(0, n_dates // 2, n_rows)
+    scales = np.maximum(rng.lognormal(3, 2, n_rows), 5)
+    started = np.arange(n_dates)[None, :] >= starts[:, None]
+    daily_cases = rng.poisson(scales[:, None] * started)
+    daily_cases[rng.random((n_rows, n_dates)) < 0.15] = 0  # unreported days
+    corrections = (rng.random((n_rows, n_dates)) < 0.005) & started
+    daily_cases[corrections] = -rng.integers(1, 4, corrections.sum())
+
+    death_lag = 12
+    daily_deaths = rng.binomial(np.clip(np.roll(daily_cases, death_lag, axis=1), 0, None), 0.02)
+    daily_deaths[:, :death_lag] = 0
+
+    dates = pd.date_range('2020-01-22', periods=n_dates)
+    dt_cols = [f'{d.month}/{d.day}/{d.year % 100}' for d in dates]
+    meta = pd.DataFrame(rows, columns=['Province/State', COL_REGION])
+    meta['Lat'] = rng.uniform(-60, 70, n_rows)
+    meta['Long'] = rng.uniform(-180, 180, n_rows)
+
+    def with_meta(daily):
+        return pd.concat([meta, pd.DataFrame(daily.cumsum(1), columns=dt_cols)], axis=1)
+
+    return with_meta(daily_cases), with_meta(daily_deaths)
+
+
+def synthetic_extra_data(regions, seed=0):
+    """ the columns that overview_table_with_extra_data() adds from reference data """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'population': rng.lognormal(15, 2, len(regions)).astype(int) + 100000,
+                         'age_adjusted_ifr': rng.uniform(0.002, 0.015, len(regions)),
+                         'age_adjusted_icu_percentage': rng.uniform(0.005, 0.03, len(regions))},
+                        index=pd.Index(regions, name=COL_REGION))
+
+
+def measure(func, repeat=3):
+    """
+    :return: tuple of the last result, best wall time in seconds of `repeat` runs, and peak
+        traced memory in MB (of a separate run, since tracing slows things down)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    with Instrumentation.recording(trace_memory=True):
+        with Instrumentation.stage('benchmark') as record:
+            func()
+    return result, min(times), record['peak_mb']
+
+
+def run_benchmarks(n_regions, n_dates, province_fraction, repeat=3, seed=0):
+    """
+    Times each stage of the pipeline separately, feeding each stage with the outputs of the
+    previous ones.
+
+    :return: dict from stage name to dict with 'seconds' and 'peak_mb'
+    """
+    dft_cases, dft_deaths = synthetic_jhu_frames(
+        n_regions=n_regions, n_dates=n_dates, province_fraction=province_fraction, seed=seed)
+    csvs = {'confirmed': dft_cases.to_csv(index=False).encode(),
+            'deaths': dft_deaths.to_csv(index=False).encode()}
+    results = {}
+
+    def stage(name, func):
+        result, seconds, peak_mb = measure(func, repeat=repeat)
+        results[name] = {'seconds': seconds, 'peak_mb': peak_mb}
+        print(f'{name:<30} {seconds * 1000:>10.1f} ms {peak_mb:>10.1f} MB')
+        return result
+
+    # the untyped pandas parsing that read_covid_csv() replaced, for comparison
+    stage('parse_covid_dataframes_untyped', lambda: {
+        name: SourceData.rename_countries(pd.read_csv(io.BytesIO(content)))
+        for name, content in csvs.items()})
+    frames = stage('parse_covid_dataframes', lambda: {
+        name: SourceData.rename_countries(SourceData.read_covid_csv(content))
+        for name, content in csvs.items()})
+
+    CovidData.load(frames)
+    data = CovidData()
+    df = synthetic_extra_data(data.dft_deaths.index, seed=seed)
+
+    stage('backfill', data._cases_with_backfilled_unreported_days)
+
+    def testing_biases():
+        CovidData._shared_results.pop(  # so that the full history windows are recalculated
+            ('testing_bias_windows', data.death_lag, 60, 300), None)
+        return data.calculate_testing_biases_dft(df['age_adjusted_ifr'])
+
+    data.testing_biases_dft = stage('calculate_testing_biases_dft', testing_biases)
+    # as in table_with_estimated_cases()
+    data.cases_est_dft = (data.dft_cases_backfilled.diff(axis=1) * data.testing_biases_dft
+                          ).cumsum(axis=1).fillna(0).astype(int)
+    df['Cases.total'] = data.dft_cases_backfilled.iloc[:, -1]
+    df['Deaths.total'] = data.dft_deaths.iloc[:, -1]
+
+    df['growth_rate'], df['growth_rate_std'] = stage(
+        'smoothed_growth_rates', lambda: data.smoothed_growth_rates(n_days=data.PREV_LAG))
+
+    past_active, past_recovered = stage(
+        'recovered_and_active', lambda: data._calculate_recovered_and_active_until_now(df))
+
+    df_proj, _ = stage('run_model_forward', lambda: Model.run_model_forward(
+        df.copy(), past_active=past_active.copy(), past_recovered=past_recovered.copy(),
+        projection_days=(7, 14, 30)))
+
+    try:
+        import geopandas  # noqa: F401 (optional, only needed for the maps)
+    except ImportError:
+        print(f'{"make_geo_df":<30} skipped (geopandas not installed)')
+    else:
+        # the full resolution shapefile vs. the preprocessed geometry (loaded from its file)
+        world = stage('world_geometry_shapefile', GeoMap.read_world_shapefile)
+        GeoMap.world_geometry()  # built once, if needed
+
+        def load_world_geometry():
+            GeoMap.world_geometry.cache_clear()
+            return GeoMap.world_geometry()
+
+        stage('world_geometry', load_world_geometry)
+        df_geo = stage('make_geo_df', lambda: GeoMap.make_geo_df(df_proj))
+
+        # GeoJSON that a map figure embeds, for all the countries
+        results['geojson_payload'] = {
+            'shapefile_mb': len(json.dumps(world['geometry'].__geo_interface__)) / 1e6,
+            'world_geometry_mb': len(json.dumps(GeoMap.geojson(GeoMap.world_geometry()['geometry']))) / 1e6}
+        print(f'{"geojson_payload":<30} {results["geojson_payload"]["world_geometry_mb"]:>10.2f} MB '
+              f'(shapefile: {results["geojson_payload"]["shapefile_mb"]:.2f} MB, '
+              f'map of {len(df_geo)} countries)')
+
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """
+    :return: list of descriptions of measurements that are worse than the baseline
+        by more than `threshold` (relative)
+    """
+    found = []
+    for name, measurements in results.items():
+        for key, value in measurements.items():
+            base_value = baseline.get(name, {}).get(key)
+            if base_value and value > base_value * (1 + threshold):
+                found.append(f'{name} {key}: {value:.4g} vs. baseline {base_value:.4g} '
+                             f'(+{value / base_value - 1:.0%})')
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--regions', type=int, default=200)
+    parser.add_argument('--dates', type=int, default=500)
+    parser.add_argument('--province-fraction', type=float, default=0.1,
+                        help='fraction of regions split into provinces')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', metavar='PATH', help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='baseline to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown or memory increase counted as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = {'regions': args.regions, 'dates': args.dates,
+             'province_fraction': args.province_fraction}
+    results = run_benchmarks(n_regions=args.regions, n_dates=args.dates,
+                             province_fraction=args.province_fraction,
+                             repeat=args.repeat, seed=args.seed)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'sizes': sizes, 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['sizes'] != sizes:
+            print(f'Warning: baseline sizes {baseline["sizes"]} differ from {sizes}')
+        found = regressions(results, baseline['results'], args.threshold)
+        for line in found:
+            print(f'REGRESSION: {line}')
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
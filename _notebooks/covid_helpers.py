@@ -1,8 +1,24 @@
+import contextlib
+import csv
 import functools
+import hashlib
+import http.client
+import importlib.util
+import inspect
+import io
+import json
+import logging
 import os
 import re
-from typing import Tuple, List
-from urllib import request
+import shutil
+import time
+import tracemalloc
+import urllib.request
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Tuple
+from urllib.error import HTTPError, URLError
 
 import numpy as np
 import pandas as pd
@@ -19,17 +35,415 @@ pd.set_option('display.max_columns', None)
 pd.set_option('display.width', 10000)
 
 SAVE_JHU_DATA = False
+# reuse locally cached JHU data without checking for updates if it's more recent than this
+JHU_CACHE_MAX_AGE_SECONDS = 3600
+# only use locally cached data, never download (e.g. COVID_HELPERS_OFFLINE=1)
+OFFLINE = os.environ.get('COVID_HELPERS_OFFLINE', '').lower() not in ('', '0', 'false')
+# record pipeline stages timings: "1" to log them, or a path of a json lines file to append to
+INSTRUMENT = os.environ.get('COVID_HELPERS_INSTRUMENT', '')
+# reuse stored (parquet) outputs of CovidData tables for the same data and parameters
+SNAPSHOTS = os.environ.get('COVID_HELPERS_SNAPSHOTS', '').lower() not in ('', '0', 'false')
+# resume the sequential full history scans from their stored state, only scanning new dates
+INCREMENTAL = os.environ.get('COVID_HELPERS_INCREMENTAL', '').lower() not in ('', '0', 'false')
 
 func_cache = functools.lru_cache(maxsize=None)  # simple memory caching
 
 
+class lazy_class_attribute:
+    """
+    Class attribute that is only computed on first access (from the class or an instance),
+    after which it's replaced by the computed value as a plain class attribute.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner):
+        value = self.func(owner)
+        setattr(owner, self.name, value)
+        return value
+
+
+class Instrumentation:
+    """
+    Opt-in recording of duration, data shape and memory of the pipeline stages.
+
+    Usage:
+        with Instrumentation.recording():
+            df = CovidData().table_with_projections()
+        Instrumentation.report()  # dataframe with a row per stage call
+
+    Each record is also passed to the sinks (callables that get the record dict), e.g.
+    Instrumentation.log_sink, or Instrumentation.json_file_sink(path).
+    """
+    enabled = False
+    trace_memory = False
+    records = []
+    sinks = []
+    _stack = []  # [start traced memory, max peak] of currently running stages
+    _untraced = 0  # memory that was traced before tracing was restarted (python < 3.9)
+
+    @classmethod
+    @contextlib.contextmanager
+    def recording(cls, sinks=(), trace_memory=True):
+        """
+        Records the stages that run inside the context (previous records are cleared).
+
+        :param sinks: callables to pass each record to
+        :param trace_memory: trace allocated memory with tracemalloc (slows down the stages)
+        """
+        prev = cls.enabled, cls.trace_memory, cls.sinks
+        cls.enabled, cls.trace_memory, cls.sinks = True, trace_memory, list(sinks)
+        cls.records = []
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+            cls._untraced = 0
+        try:
+            yield cls
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            cls.enabled, cls.trace_memory, cls.sinks = prev
+
+    @classmethod
+    @contextlib.contextmanager
+    def stage(cls, name):
+        """
+        Records the block as a stage if recording is enabled. The yielded dict can be
+        updated with the shape of the processed data (see record_shape()).
+        """
+        if not cls.enabled:
+            yield {}
+            return
+
+        record = {'stage': name, 'depth': len(cls._stack)}
+        tracing = cls.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = cls._traced_memory()
+            if cls._stack:  # keep the peak of the running parent stage
+                cls._stack[-1][1] = max(cls._stack[-1][1], peak)
+            cls._reset_peak()
+            current, _ = cls._traced_memory()
+            cls._stack.append([current, current])
+        else:
+            cls._stack.append([0, 0])
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            start_memory, max_peak = cls._stack.pop()
+            if tracing:
+                current, peak = cls._traced_memory()
+                peak = max(peak, max_peak)
+                record['allocated_mb'] = (current - start_memory) / 2 ** 20
+                record['peak_mb'] = (peak - start_memory) / 2 ** 20
+                if cls._stack:
+                    cls._stack[-1][1] = max(cls._stack[-1][1], peak)
+            cls.records.append(record)
+            for sink in cls.sinks:
+                sink(record)
+
+    @classmethod
+    def _traced_memory(cls):
+        current, peak = tracemalloc.get_traced_memory()
+        return cls._untraced + current, cls._untraced + peak
+
+    @classmethod
+    def _reset_peak(cls):
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            # python < 3.9: restarting resets the peak, but also forgets the traced blocks,
+            # so their size is kept (frees of those blocks aren't seen after the restart)
+            cls._untraced += tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            tracemalloc.start()
+
+    @staticmethod
+    def record_shape(record, result):
+        # shape of the first dataframe / array in the result
+        for item in (result if isinstance(result, tuple) else (result,)):
+            if hasattr(item, 'shape') and len(item.shape) in (1, 2):
+                record['rows'] = item.shape[0]
+                record['columns'] = item.shape[1] if len(item.shape) == 2 else 1
+                break
+
+    @classmethod
+    def report(cls):
+        """ :return: dataframe of the records, in the order the stages finished """
+        columns = ['stage', 'depth', 'seconds', 'rows', 'columns', 'allocated_mb', 'peak_mb']
+        return pd.DataFrame(cls.records, columns=columns)
+
+    @classmethod
+    def summary(cls):
+        """ :return: records aggregated by stage """
+        return cls.report().groupby('stage', sort=False).agg(
+            calls=('seconds', 'size'), seconds=('seconds', 'sum'),
+            peak_mb=('peak_mb', 'max')).sort_values('seconds', ascending=False)
+
+    @staticmethod
+    def log_sink(record):
+        logging.getLogger(__name__).info(
+            ' '.join(f'{k}={v:.4g}' if isinstance(v, float) else f'{k}={v}'
+                     for k, v in record.items()))
+
+    @staticmethod
+    def json_file_sink(path):
+        def sink(record):
+            with open(path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+        return sink
+
+
+def instrumented(name):
+    """ decorator for recording a function as an Instrumentation stage """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Instrumentation.enabled:
+                return func(*args, **kwargs)
+            with Instrumentation.stage(name) as record:
+                result = func(*args, **kwargs)
+                Instrumentation.record_shape(record, result)
+            return result
+        return wrapper
+    return decorator
+
+
+if INSTRUMENT:
+    Instrumentation.enabled = Instrumentation.trace_memory = True
+    Instrumentation.sinks = [Instrumentation.log_sink if INSTRUMENT == '1'
+                             else Instrumentation.json_file_sink(INSTRUMENT)]
+    tracemalloc.start()
+
+
+class SnapshotStore:
+    """
+    Stores outputs of CovidData tables as parquet files (needs pyarrow), keyed by the data,
+    the parameters and the code version, so that later notebooks in the same build,
+    and re-runs on the same data, can read them instead of recalculating.
+    Enabled by setting COVID_HELPERS_SNAPSHOTS=1.
+    """
+    enabled = SNAPSHOTS
+    folder = os.path.join(data_folder, 'snapshots')
+    code_version = lazy_class_attribute(
+        lambda cls: hashlib.sha1(open(__file__, 'rb').read()).hexdigest()[:12]
+        if '__file__' in globals() else '')
+
+    @classmethod
+    def path(cls, stage, call_items, data_date, key_items):
+        """
+        :param call_items: identify the call (e.g. the arguments), each call has a single
+            stored output, the one of its latest key
+        :param key_items: the data and configuration that the output depends on
+        """
+        def digest(items):
+            return hashlib.sha1(json.dumps(items, default=str).encode()).hexdigest()[:16]
+
+        call = digest([stage, call_items])
+        key = digest([data_date, cls.code_version, key_items])
+        return os.path.join(cls.folder, f'{stage}_{call}_{data_date}_{key}')
+
+    @classmethod
+    def remove_older(cls, path):
+        """ removes the outputs stored for the same call as the path, with other keys """
+        folder, name = os.path.split(path)
+        call_prefix = name[:name.rindex('_', 0, name.rindex('_')) + 1]
+        for other in os.listdir(folder):
+            if other.startswith(call_prefix) and other != name and '.tmp' not in other:
+                shutil.rmtree(os.path.join(folder, other), ignore_errors=True)
+
+    @classmethod
+    def save(cls, path, result, attrs):
+        """
+        :param path: snapshot folder path
+        :param result: dataframe, or tuple of dataframes and lists of dataframes
+        :param attrs: dict of extra dataframes to store (e.g. instance attributes)
+        """
+        items = result if isinstance(result, tuple) else (result,)
+        layout = {'tuple': isinstance(result, tuple), 'items': [], 'attrs': list(attrs)}
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        os.makedirs(tmp_path, exist_ok=True)
+        for i, item in enumerate(items):
+            if isinstance(item, list):  # e.g. debug dfs, stored as one table
+                item = pd.concat(item, keys=range(len(item)), names=['_snapshot_part'])
+                layout['items'].append('list')
+            else:
+                layout['items'].append('frame')
+            item.to_parquet(os.path.join(tmp_path, f'{i}.parquet'))
+        for name, df in attrs.items():
+            df.to_parquet(os.path.join(tmp_path, f'{name}.parquet'))
+        with open(os.path.join(tmp_path, 'layout.json'), 'w') as f:
+            json.dump(layout, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        cls.remove_older(path)
+
+    @classmethod
+    def load(cls, path):
+        """ :return: tuple of result and dict of extra dataframes, or None if not stored """
+        if not os.path.exists(os.path.join(path, 'layout.json')):
+            return None
+
+        def read(name):
+            return pd.read_parquet(os.path.join(path, f'{name}.parquet'), memory_map=True)
+
+        try:
+            with open(os.path.join(path, 'layout.json')) as f:
+                layout = json.load(f)
+            items = []
+            for i, kind in enumerate(layout['items']):
+                df = read(i)
+                if kind == 'list':
+                    df = [part.droplevel('_snapshot_part')
+                          for _, part in df.groupby(level='_snapshot_part', sort=True)]
+                items.append(df)
+            attrs = {name: read(name) for name in layout['attrs']}
+        except FileNotFoundError:  # removed meanwhile by a process with newer data
+            return None
+        result = tuple(items) if layout['tuple'] else items[0]
+        return result, attrs
+
+
+def snapshotted(stage, attrs=(), sources=()):
+    """
+    decorator for storing the output of a CovidData table method in SnapshotStore (when
+    enabled), together with the instance attributes it sets (`attrs`). `sources` are the
+    other data sources (classes with a data_fingerprint() method) that the output depends on.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not SnapshotStore.enabled:
+                return func(self, *args, **kwargs)
+
+            arguments = signature.bind(self, *args, **kwargs)
+            arguments.apply_defaults()
+            # the days offset and the arguments, so that a call's older outputs are removed
+            call_items = [len(self.dt_cols) - len(self.dt_cols_all),
+                          list(arguments.arguments.items())[1:]]
+            key_items = [self.data_fingerprint(), self.backfill_prev_threshold, self.death_lag,
+                         [source.data_fingerprint() for source in sources]]
+            data_date = pd.to_datetime(self.dt_cols[-1]).date().isoformat()
+            path = SnapshotStore.path(stage, call_items, data_date, key_items)
+
+            stored = SnapshotStore.load(path)
+            if stored is not None:
+                result, attr_values = stored
+                for name, value in attr_values.items():
+                    setattr(self, name, value)
+                return result
+
+            result = func(self, *args, **kwargs)
+            SnapshotStore.save(path, result, {name: getattr(self, name) for name in attrs})
+            return result
+        return wrapper
+    return decorator
+
+
+class Fetcher:
+    """
+    Downloads of the external sources (urllib, so proxies, redirects and auth are as in
+    urlopen), with timeouts and retries. prefetch() downloads several sources concurrently
+    in a thread pool, and the responses are kept (per url and headers) for the loaders
+    that request them later, so they only parse already fetched bytes.
+
+    Errors are raised as in urllib: HTTPError for error (and 304) statuses, URLError for
+    connection errors.
+    """
+    timeout = 60
+    retries = 3  # for connection errors, timeouts, and 429 / 5xx statuses
+    retry_backoff_seconds = 1
+    max_concurrent = 8
+
+    _responses = {}  # (url, headers) -> (content, headers) or exception, from prefetch()
+
+    @classmethod
+    def _key(cls, url, headers):
+        return url, tuple(sorted((headers or {}).items()))
+
+    @classmethod
+    def _request_once(cls, url, headers):
+        request = urllib.request.Request(
+            url, headers={'User-Agent': 'covid19-dashboard', **(headers or {})})
+        # a new opener, so that the proxies are of the current environment (urlopen()'s
+        # opener keeps the ones of its first use)
+        opener = urllib.request.build_opener()
+        try:
+            with opener.open(request, timeout=cls.timeout) as response:
+                return response.read(), response.headers
+        except URLError:
+            raise
+        except (OSError, http.client.HTTPException) as e:  # e.g. timeouts while reading
+            raise URLError(e)
+
+    @classmethod
+    def _request_with_retries(cls, url, headers=None):
+        for attempt in range(cls.retries + 1):
+            try:
+                return cls._request_once(url, headers)
+            except HTTPError as e:
+                if not (e.code == 429 or e.code >= 500) or attempt == cls.retries:
+                    raise
+            except URLError:
+                if attempt == cls.retries:
+                    raise
+            time.sleep(cls.retry_backoff_seconds * 2 ** attempt)
+
+    @classmethod
+    def request(cls, url, headers=None):
+        """
+        :return: tuple of response content (bytes) and headers, from prefetch() if
+            it was fetched there, or from a new request
+        """
+        response = cls._responses.pop(cls._key(url, headers), None)
+        if response is None:
+            return cls._request_with_retries(url, headers)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    @classmethod
+    def get(cls, url) -> bytes:
+        return cls.request(url)[0]
+
+    @classmethod
+    def prefetch(cls, urls):
+        """
+        Fetches the urls concurrently, and keeps the responses (or errors) for request().
+
+        :param urls: list of urls, or of (url, headers dict) tuples
+        """
+        requests = [(url, None) if isinstance(url, str) else url for url in urls]
+
+        def fetch(url, headers):
+            try:
+                return cls._request_with_retries(url, headers)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=cls.max_concurrent) as pool:
+            responses = list(pool.map(fetch, *zip(*requests))) if requests else []
+        for (url, headers), response in zip(requests, responses):
+            cls._responses[cls._key(url, headers)] = response
+
+
 class SourceData:
-    df_mappings = pd.read_csv(os.path.join(data_folder, 'mapping_countries.csv'))
+    df_mappings = lazy_class_attribute(
+        lambda cls: pd.read_csv(os.path.join(data_folder, 'mapping_countries.csv')))
 
-    mappings = {'replace.country': dict(df_mappings.dropna(subset=['Name'])
-                                        .set_index('Country')['Name']),
-                'map.continent': dict(df_mappings.set_index('Name')['Continent'])
-                }
+    mappings = lazy_class_attribute(
+        lambda cls: {'replace.country': dict(cls.df_mappings.dropna(subset=['Name'])
+                                             .set_index('Country')['Name']),
+                     'map.continent': dict(cls.df_mappings.set_index('Name')['Continent'])
+                     })
 
     @classmethod
     def _cache_csv_path(cls, name):
@@ -45,20 +459,171 @@ class SourceData:
         df[df.columns[2:]] = df[df.columns[2:]].apply(pd.to_numeric, errors='coerce')
         return df
 
+    jhu_url = ('https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/'
+               'csse_covid_19_time_series/time_series_covid19_{name}_global.csv')
+
+    @classmethod
+    def _cache_raw_paths(cls, name):
+        cache_dir = os.path.join(data_folder, 'covid_jhu')
+        return (os.path.join(cache_dir, f'{name}_raw.pkl'),
+                os.path.join(cache_dir, f'{name}_raw.meta.json'))
+
+    @classmethod
+    def _read_cache_meta(cls, name):
+        df_path, meta_path = cls._cache_raw_paths(name)
+        if not (os.path.exists(df_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    @classmethod
+    def _write_cache(cls, name, meta, df=None):
+        df_path, meta_path = cls._cache_raw_paths(name)
+        os.makedirs(os.path.dirname(df_path), exist_ok=True)
+        if df is not None:
+            df.to_pickle(df_path)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+
     @classmethod
     def _download_covid_df(cls, name):
-        url = ('https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/'
-               f'csse_covid_19_time_series/time_series_covid19_{name}_global.csv')
-        df = pd.read_csv(url)
+        """
+        Returns the raw JHU dataframe, using a local cache of the last download.
+
+        The cached copy is used as is if it's recent (JHU_CACHE_MAX_AGE_SECONDS)
+        or if OFFLINE is set. Otherwise it's revalidated with a conditional request
+        (ETag / Last-Modified) and is only downloaded again if it was changed.
+        """
+        url = cls.jhu_url.format(name=name)
+        df_path, _ = cls._cache_raw_paths(name)
+        meta = cls._read_cache_meta(name)
+
+        jhu_request = cls._jhu_request(name)
+        if jhu_request is None:
+            if meta is not None and meta.get('url') == url:
+                return pd.read_pickle(df_path)
+            raise FileNotFoundError(
+                f'No cached JHU data for "{name}" in {os.path.dirname(df_path)} (offline mode)')
+        _, headers = jhu_request
+
+        try:
+            content, response_headers = Fetcher.request(url, headers)
+        except HTTPError as e:
+            if e.code == 304 and headers:  # not modified
+                meta['checked_at'] = time.time()
+                cls._write_cache(name, meta)
+                return pd.read_pickle(df_path)
+            raise
+        except URLError as e:
+            if meta is None:
+                raise
+            warnings.warn(f'Using stale cached JHU data for "{name}", download failed: {e}')
+            return pd.read_pickle(df_path)
+
+        df = cls.read_covid_csv(content)
+        cls._write_cache(name,
+                         meta={'url': url,
+                               'etag': response_headers.get('ETag'),
+                               'last_modified': response_headers.get('Last-Modified'),
+                               'checked_at': time.time()},
+                         df=df)
         return df
 
     @classmethod
+    def _jhu_request(cls, name):
+        """
+        :return: tuple of url and (conditional) headers of the request needed for
+            JHU data `name`, or None if the cache should be used without a request
+        """
+        url = cls.jhu_url.format(name=name)
+        meta = cls._read_cache_meta(name)
+        cached = meta is not None and meta.get('url') == url
+        if OFFLINE or (cached and time.time() - meta['checked_at'] < JHU_CACHE_MAX_AGE_SECONDS):
+            return None
+
+        headers = {}
+        if cached:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return url, headers
+
+    @classmethod
+    def prefetch(cls):
+        """ fetches concurrently all the external sources that will be needed """
+        if OFFLINE:
+            return
+        requests = [r for r in [cls._jhu_request('confirmed'), cls._jhu_request('deaths')] if r]
+        if not OWID.latest_snapshot.cache_info().currsize:
+            requests.append(OWID.url_latest)
+        requests.extend(table.page for table in [HostpitalBeds, EmojiFlags]
+                        if not os.path.exists(table.csv_path()))
+        Fetcher.prefetch(requests)
+
+    jhu_key_columns = ['Province/State', COL_REGION, 'Lat', 'Long']
+
+    # pyarrow's (multithreaded) csv reader is used if it's installed
+    csv_engine = lazy_class_attribute(
+        lambda cls: 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c')
+
+    @classmethod
+    def read_covid_csv(cls, content: bytes) -> pd.DataFrame:
+        """
+        Parses JHU wide format csv: the key columns followed by a column of counts per date.
+        The counts are a single int32 block (float64 if some values are missing), and
+        trailing dates without any values (e.g. after a trailing comma) are dropped.
+        """
+        if cls.csv_engine == 'pyarrow':
+            meta, dates, values = cls._read_covid_csv_pyarrow(content)
+        else:
+            df = pd.read_csv(io.BytesIO(content))
+            meta = df[[c for c in df.columns if c in cls.jhu_key_columns]]
+            dates = [c for c in df.columns if c not in cls.jhu_key_columns]
+            values = df[dates].values
+
+        with_values = np.flatnonzero(~pd.isna(values).all(axis=0))
+        n_dates = with_values[-1] + 1 if len(with_values) else 0
+        values = values[:, :n_dates]
+        if values.dtype.kind == 'f' and not np.isnan(values).any():
+            values = values.astype(np.int64)
+        values = RegionSeries.compact(values)
+        return pd.concat([meta, pd.DataFrame(values, index=meta.index, columns=dates[:n_dates])],
+                         axis=1)
+
+    @classmethod
+    def _read_covid_csv_pyarrow(cls, content: bytes):
+        """
+        :return: tuple of key columns dataframe, list of dates and 2d array of counts,
+            parsed with explicit column types (no type inference for the dates)
+        """
+        import pyarrow as pa
+        import pyarrow.csv
+        header = next(csv.reader([content[:content.find(b'\n')].decode('utf-8-sig')]))
+        dates = [c for c in header if c not in cls.jhu_key_columns]
+        key_types = {'Province/State': pa.string(), COL_REGION: pa.string(),
+                     'Lat': pa.float64(), 'Long': pa.float64()}
+        table = pyarrow.csv.read_csv(io.BytesIO(content), convert_options=pyarrow.csv.ConvertOptions(
+            column_types={**key_types, **{c: pa.int64() for c in dates}}, strings_can_be_null=True))
+
+        keys = [i for i, c in enumerate(header) if c in key_types]
+        columns = [col for i, col in enumerate(table.columns) if i not in keys]
+        with_nulls = any(col.null_count for col in columns)
+        values = np.empty((table.num_rows, len(columns)), float if with_nulls else np.int64)
+        for i, col in enumerate(columns):
+            values[:, i] = col.to_numpy()
+        return table.select(keys).to_pandas(), dates, values
+
+    @classmethod
+    @instrumented('SourceData.get_covid_dataframe')
     def get_covid_dataframe(cls, name):
         df = cls._download_covid_df(name)
         if SAVE_JHU_DATA:
             cls._save_covid_df(df, name)
+        return cls.rename_countries(df)
 
-        # rename countries
+    @classmethod
+    def rename_countries(cls, df):
         df[COL_REGION] = df[COL_REGION].replace(cls.mappings['replace.country'])
         return df
 
@@ -81,7 +646,7 @@ class OWID:
     @classmethod
     @func_cache
     def latest_snapshot(cls):
-        df_raw = pd.read_csv(cls.url_latest)
+        df_raw = pd.read_csv(io.BytesIO(Fetcher.get(cls.url_latest)))
         df = (df_raw
               .rename(columns={'location': COL_REGION})
               .dropna(subset=[COL_REGION]))
@@ -96,6 +661,12 @@ class OWID:
         })
         return df.set_index(COL_REGION)
 
+    @classmethod
+    def data_fingerprint(cls):
+        """ hash of the latest snapshot, so that stored outputs that include it are updated """
+        return hashlib.sha1(pd.util.hash_pandas_object(
+            cls.latest_snapshot(), index=True).values.tobytes()).hexdigest()
+
     @classmethod
     def latest_icu_per_mil(cls):
         return cls.latest_snapshot()[cls.icu_per_mil_col].dropna()
@@ -197,11 +768,9 @@ class AgeAdjustedData:
 
         df_num = df_filt.set_index(COL_REGION)
 
-        # convert to numbers
-        df_num = df_num.apply(lambda s:
-                              pd.Series(s)
-                              .str.replace(' ', '')
-                              .apply(pd.to_numeric, errors='coerce'))
+        # convert to numbers (a column at a time), values have spaces as thousands separators
+        df_num = df_num.apply(lambda s: pd.to_numeric(s.str.replace(' ', '', regex=False),
+                                                      errors='coerce'))
 
         population_s = df_num.sum(1) * 1000
 
@@ -236,7 +805,7 @@ class ScrapedTableBase:
         import bs4
 
         # read html
-        source = request.urlopen(cls.page).read()
+        source = Fetcher.get(cls.page)
         soup = bs4.BeautifulSoup(source, 'lxml')
 
         # get pandas df
@@ -327,6 +896,184 @@ class EmojiFlags(ScrapedTableBase):
         df_filt.to_csv(cls.csv_path(), index=False)
 
 
+class ReferenceData:
+    """
+    The static per region data that's joined into the overview table (age adjusted IFR,
+    population and ICU need, ICU capacity and emoji flags). Built from the source files
+    and stored as a pickle keyed by their hashes, so it's only rebuilt when a source file
+    (or the code) changes, and loaded once per process.
+    """
+    folder = os.path.join(data_folder, 'reference')
+    scraped_tables = [HostpitalBeds, EmojiFlags]
+
+    @classmethod
+    def source_paths(cls):
+        return [AgeAdjustedData.csv_path] + [table.csv_path() for table in cls.scraped_tables]
+
+    @classmethod
+    def download_missing(cls):
+        for table in cls.scraped_tables:
+            if not os.path.exists(table.csv_path()):
+                table.download()
+
+    @classmethod
+    def data_fingerprint(cls):
+        """ hash of the source files (and the code), so that stored outputs that include
+        the reference data are updated """
+        cls.download_missing()
+        digest = hashlib.sha1(SnapshotStore.code_version.encode())
+        for source_path in cls.source_paths():
+            with open(source_path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def path(cls):
+        return os.path.join(cls.folder, f'reference_{cls.data_fingerprint()}.pkl')
+
+    @classmethod
+    def build(cls) -> pd.DataFrame:
+        """ :return: dataframe indexed by region """
+        ifr_s, population_s, icu_percent_s = AgeAdjustedData.load()
+        return pd.DataFrame({
+            'emoji_flag': EmojiFlags.load().set_index(COL_REGION)[EmojiFlags.emoji_col],
+            'age_adjusted_ifr': ifr_s,
+            'population': population_s,
+            'age_adjusted_icu_percentage': icu_percent_s,
+            'icu_capacity_per100k': CovidData.beds_df()['icu_per_100k'],
+        })
+
+    @classmethod
+    @func_cache
+    def load(cls) -> pd.DataFrame:
+        path = cls.path()
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        df = cls.build()
+        os.makedirs(cls.folder, exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return df
+
+
+class RegionAggregation:
+    """
+    Reusable index for summing rows by their group labels (e.g. provinces rows to
+    countries). It's built once, and each rollup is then a single np.add.reduceat instead
+    of a groupby. Rows with missing labels are dropped, groups are sorted, and missing
+    values are summed as zeros, as in groupby().sum().
+    covid_overview.group_sum() is a standalone copy of it, keep the two in sync.
+    """
+
+    def __init__(self, labels, name=None):
+        codes, groups = pd.factorize(np.asarray(labels, dtype=object), sort=True)
+        order = np.argsort(codes, kind='stable')
+        self.order = order[codes[order] >= 0]  # missing labels are -1
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        self.groups = pd.Index(groups, name=name)
+
+    def sum(self, values: np.ndarray) -> np.ndarray:
+        """ :return: sums of the rows of `values` for each group """
+        if not len(self.order):
+            return np.zeros((0,) + values.shape[1:], dtype=values.dtype)
+        values = values[self.order]
+        if values.dtype.kind == 'f':  # reduceat would propagate nans
+            values = np.where(np.isnan(values), 0, values)
+        return np.add.reduceat(values, self.starts, axis=0,
+                               dtype=np.int64 if values.dtype.kind in 'iu' else None)
+
+    def sum_frame(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        return pd.DataFrame(self.sum(df[columns].values), index=self.groups, columns=columns)
+
+
+class RegionSeries:
+    """
+    Regions x dates matrix (e.g. of total cases) in one contiguous array, with a regions
+    index and a datetime64 dates axis. Dates are selected by integer slicing, and taking
+    the first dates (e.g. for a days offset) is a view that doesn't copy the values.
+    Integer counts are stored as int32 if they fit.
+    """
+    __slots__ = ('values', 'regions', 'labels', '_dates')
+
+    def __init__(self, values: np.ndarray, regions: pd.Index, labels, dates=None):
+        self.values = values
+        self.regions = regions
+        self.labels = pd.Index(labels)  # original date column labels (e.g. '6/2/21')
+        self._dates = dates
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        if self._dates is None:  # parsed on first use, and passed on to slices
+            self._dates = pd.to_datetime(self.labels, format='%m/%d/%y')
+        return self._dates
+
+    @staticmethod
+    def compact(values):
+        if values.dtype.kind in 'iu' and len(values) and (
+                np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max):
+            return np.ascontiguousarray(values, dtype=np.int32)
+        return np.ascontiguousarray(values)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        return cls(cls.compact(df.values), df.index, df.columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """ :return: dataframe with the date labels as columns (a view of the values) """
+        return pd.DataFrame(self.values, index=self.regions, columns=self.labels, copy=False)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _new(self, values, dates_slice=None, regions=None):
+        dates = self._dates
+        if dates_slice is not None and dates is not None:
+            dates = dates[dates_slice]
+        return RegionSeries(values,
+                            self.regions if regions is None else regions,
+                            self.labels if dates_slice is None else self.labels[dates_slice],
+                            dates)
+
+    def first_dates(self, n_dates):
+        return self._new(self.values[:, :n_dates], dates_slice=slice(None, n_dates))
+
+    def last_dates(self, n_dates):
+        return self._new(self.values[:, -n_dates:], dates_slice=slice(-n_dates, None))
+
+    def loc(self, regions):
+        """ rows of `regions` (in that order) """
+        return self._new(self.values[self.regions.get_indexer(regions)],
+                         regions=pd.Index(regions))
+
+    def column(self, i=-1) -> pd.Series:
+        """ values of the `i`th date, as int64 / float64 for safe arithmetic in tables """
+        values = self.values[:, i]
+        return pd.Series(values.astype(np.int64 if values.dtype.kind in 'iu' else np.float64),
+                         index=self.regions, name=self.labels[i])
+
+    def lag(self, days):
+        """ values `days` before the last date (as in dt_cols[-days]) """
+        return self.column(-days)
+
+    def diff(self):
+        """ daily differences, the first date's difference is 0 """
+        diffs = np.zeros_like(self.values)
+        np.subtract(self.values[:, 1:], self.values[:, :-1], out=diffs[:, 1:])
+        return self._new(diffs)
+
+    def last_positive_index(self, skip_dates=0) -> np.ndarray:
+        """
+        :param skip_dates: number of first dates that are not considered
+        :return: index of the last date with a positive value for each region, -1 if none
+        """
+        positive = self.values[:, skip_dates:] > 0
+        from_end = positive[:, ::-1].argmax(axis=1)
+        return np.where(positive.any(axis=1), self.shape[1] - 1 - from_end, -1)
+
+
 class CovidData:
     COL_REGION = COL_REGION
     CASES_TOT = 'Cases.total'
@@ -336,100 +1083,337 @@ class CovidData:
 
     PER_100K_SUFFIX = '.per100k'
 
-    dft_cases_raw = SourceData.get_covid_dataframe('confirmed')
-    dft_deaths_raw = SourceData.get_covid_dataframe('deaths')
-    # dft_recovered = SourceData.get_covid_dataframe('recovered')
-    dt_cols_all = SourceData.get_dates(dft_cases_raw)
-
-    cur_date = pd.to_datetime(dt_cols_all[-1]).date().isoformat()
+    # source data, loaded on first access (or explicitly using load())
+    dft_cases_raw = lazy_class_attribute(lambda cls: cls.load().dft_cases_raw)
+    dft_deaths_raw = lazy_class_attribute(lambda cls: cls.load().dft_deaths_raw)
+    dt_cols_all = lazy_class_attribute(lambda cls: cls.load().dt_cols_all)
+    cur_date = lazy_class_attribute(lambda cls: cls.load().cur_date)
 
     PREV_LAG = 5
 
     # modeling constants
+    ## backfilling of unreported days
+    backfill_prev_threshold = 50
     ## testing bias
     death_lag = 8
 
+    # results of calculations on the full history, shared by instances of all days offsets
+    _shared_results = {}
+
+    # store the state of the sequential scans (backfill, testing bias windows, recovery
+    # history), and resume them for the new dates on the next run (if the previous dates'
+    # data didn't change, for the recovery history per country)
+    incremental = INCREMENTAL
+    state_folder = os.path.join(data_folder, 'covid_state')
+
     def __init__(self, days_offset=0):
         assert days_offset <= 0, 'day_offest can only be 0 or negative (in the past)'
         self.dt_cols = self.dt_cols_all[:(len(self.dt_cols_all) + days_offset)]
-        self.dft_cases_backfilled = self._cases_with_backfilled_unreported_days()[self.dt_cols]
-        self.dft_deaths = self.dft_deaths_raw.groupby(COL_REGION).sum()[self.dt_cols]
-        self.dfc_cases = self.dft_cases_backfilled[self.dt_cols[-1]]
-        self.dfc_deaths = self.dft_deaths[self.dt_cols[-1]]
+        # views of the first dates of the full history matrices
+        self.cases = self._shared_cases().first_dates(len(self.dt_cols))
+        self.deaths = self._shared_deaths().first_dates(len(self.dt_cols))
+        self.dfc_cases = self.cases.column(-1)
+        self.dfc_deaths = self.deaths.column(-1)
 
         # to be calculated later
         self.testing_biases_dft: pd.DataFrame = None
-        self.cases_est_dft: pd.DataFrame = None
-
-    def _cases_with_backfilled_unreported_days(self):
-
-        def backfill_missing(series, backfill_prev_threshold=50):
-            """
-            Fills 0 diff days between days with large measurements by spreading the
-            future's "catch up" day's cases on the zero days.
-
-            :param series: pandas series of daily cases
-            :param backfill_prev_threshold: number of cases per day after which a 0 day
-                is considered a missing measurement rather than a true zero
-            :return: backfilled series of daily cases
-            """
-            out = [series[0]]
-            missing = 0
-            for cur in series[1:]:
-                if cur == 0:
-                    if out[-1] >= backfill_prev_threshold:
-                        # a lot of cases on previous appended day
-                        missing += 1  # increase missing days
-                    else:
-                        # normal: too few cases previously, a zero is plausible
-                        out.append(cur)
-                elif cur > 0:
-                    if missing:
-                        # catching up by backfilling from current value
-                        out.extend([cur / (missing + 1)] * (missing + 1))
-                        missing = 0  # reset missing condition
-                    else:
-                        # normal: cases accumulating
-                        out.append(cur)
-                else:  # cur < 0
-                    # some kind of data adjustment (e.g. France)
-                    if missing:  # reset missing
-                        out.extend([0] * missing)
-                        missing = 0
-                    out.append(cur)
-
-            if missing:  # finished on missing (no "catch up" day until now)
-                out.extend([0] * missing)
-
-            return pd.Series(out, index=series.index)
-
-        cases = self.dft_cases_raw.groupby(self.COL_REGION).sum()[self.dt_cols_all]
+        self.cases_est: RegionSeries = None
+
+    @property
+    def dft_cases_backfilled(self) -> pd.DataFrame:
+        return self.cases.to_frame()
+
+    @property
+    def dft_deaths(self) -> pd.DataFrame:
+        return self.deaths.to_frame()
+
+    @property
+    def cases_est_dft(self) -> pd.DataFrame:
+        return None if self.cases_est is None else self.cases_est.to_frame()
+
+    @cases_est_dft.setter
+    def cases_est_dft(self, df: pd.DataFrame):
+        self.cases_est = None if df is None else RegionSeries.from_frame(df)
+
+    def _shared_cases(self) -> RegionSeries:
+        return self._shared(
+            ('cases_backfilled', self.backfill_prev_threshold),
+            lambda: RegionSeries.from_frame(self._cases_with_backfilled_unreported_days()))
+
+    @classmethod
+    def _shared_deaths(cls) -> RegionSeries:
+        return cls._regions_total('deaths')
+
+    @classmethod
+    def _regions_total(cls, name) -> RegionSeries:
+        """
+        Raw JHU data ('confirmed' or 'deaths') summed by region, using an aggregation
+        index that is built once per dataframe.
+        """
+        def calculate():
+            df = {'confirmed': cls.dft_cases_raw, 'deaths': cls.dft_deaths_raw}[name]
+            aggregation = RegionAggregation(df[COL_REGION], name=COL_REGION)
+            return RegionSeries.from_frame(aggregation.sum_frame(df, cls.dt_cols_all))
+        return cls._shared(('regions_total', name), calculate)
+
+    @classmethod
+    @instrumented('CovidData.load')
+    def load(cls, source=None):
+        """
+        Loads the source data for all the instances (replacing previously loaded data).
+
+        :param source: where to get the raw JHU dataframes from:
+            - None to download them (using SourceData)
+            - a dict of raw JHU format dataframes with 'confirmed' and 'deaths' keys
+                (e.g. small fixture frames)
+            - an object with a `get_covid_dataframe(name)` method, like SourceData
+        :return: the class, for chaining
+        """
+        if source is None:
+            source = SourceData
+            SourceData.prefetch()
+
+        if isinstance(source, dict):
+            def get_covid_dataframe(name):
+                return SourceData.rename_countries(source[name].copy())
+        else:
+            get_covid_dataframe = source.get_covid_dataframe
+
+        cls.dft_cases_raw = get_covid_dataframe('confirmed')
+        cls.dft_deaths_raw = get_covid_dataframe('deaths')
+        # cls.dft_recovered = get_covid_dataframe('recovered')
+        cls.dt_cols_all = SourceData.get_dates(cls.dft_cases_raw)
+
+        cls.cur_date = pd.to_datetime(cls.dt_cols_all[-1]).date().isoformat()
+        cls._shared_results = {}
+        return cls
+
+    @classmethod
+    def data_fingerprint(cls):
+        """ hash of the raw data, so that revisions of past data are detected """
+        return cls._shared('data_fingerprint', lambda: hashlib.sha1(b''.join(
+            pd.util.hash_pandas_object(df, index=False).values.tobytes()
+            for df in [cls.dft_cases_raw, cls.dft_deaths_raw])).hexdigest())
+
+    @classmethod
+    def _shared(cls, key, calculate):
+        """
+        Memoizes a calculation on the full history (all dates) so that it's done only once
+        for instances of all days offsets (until data is loaded again).
+        """
+        if key not in cls._shared_results:
+            cls._shared_results[key] = calculate()
+        return cls._shared_results[key]
+
+    @classmethod
+    def _resume_scan(cls, name, params, regions, inputs, scan):
+        """
+        Runs `scan(state)` with the stored state of a previous run, if the previous run's
+        inputs are the first dates of the current `inputs` (same regions and values),
+        or with None otherwise (full scan). The new state is stored for the next run.
+
+        :param name: name of the scan
+        :param params: parameters of the scan (part of the key of the stored state)
+        :param regions: index of the regions (rows of the inputs)
+        :param inputs: list of 2D arrays (regions x dates) the scan depends on
+        :param scan: function from previous state (or None) to the state for all `inputs`
+        """
+        state = None
+        stored = cls._load_state(name, params)
+        if stored is not None:
+            n_stored = stored['inputs'][0].shape[1]
+            if (stored['regions'].equals(regions) and
+                    n_stored <= inputs[0].shape[1] and
+                    all(np.array_equal(prev, cur[:, :n_stored])
+                        for prev, cur in zip(stored['inputs'], inputs))):
+                state = stored['state']
+
+        state = scan(state)
+        cls._store_state(name, params, {'regions': regions, 'inputs': inputs, 'state': state})
+        return state
+
+    @classmethod
+    def _state_path(cls, name, params):
+        # the code version is part of the key, so that states of older code aren't resumed
+        key = hashlib.sha1(json.dumps([name, params]).encode()).hexdigest()[:12]
+        return os.path.join(cls.state_folder, f'{name}_{key}_{SnapshotStore.code_version}.pkl')
+
+    @classmethod
+    def _load_state(cls, name, params):
+        """ :return: the state stored by _store_state(), or None """
+        path = cls._state_path(name, params)
+        return pd.read_pickle(path) if os.path.exists(path) else None
+
+    @classmethod
+    def _store_state(cls, name, params, stored):
+        """ stores the state for the next run, and removes the ones of other code versions """
+        path = cls._state_path(name, params)
+        os.makedirs(cls.state_folder, exist_ok=True)
+        file_name = os.path.basename(path)
+        prefix = file_name[:file_name.rindex('_') + 1]
+        for other in os.listdir(cls.state_folder):
+            if other.startswith(prefix) and other != file_name:
+                os.remove(os.path.join(cls.state_folder, other))
+        pd.to_pickle(stored, path)
+
+    @classmethod
+    def at_offsets(cls, days_offsets, projection_days=(7, 14, 30), debug_dfs=False,
+                   debug_format='frames'):
+        """
+        Calculates projection tables for several days offsets, sharing the work that is
+        done on the full history (backfilling, testing bias windows, recovery history)
+        between them.
+
+        :param days_offsets: days offsets (0 or negative) to calculate the tables for
+        :param projection_days: passed to table_with_projections(), or a dict from days
+            offset to its projection days
+        :param debug_dfs: True to also return the debug dataframes for all the offsets,
+            or a collection of the offsets to return them for
+        :param debug_format: passed to table_with_projections() (for debug_dfs offsets)
+        :return: dict from days offset to its projections table (or to a tuple of the table
+            and the debug dataframes for offsets that return them)
+        """
+        if isinstance(debug_dfs, bool):
+            debug_dfs = days_offsets if debug_dfs else ()
+        tables = {}
+        for offset in days_offsets:
+            kwargs = dict(projection_days=(projection_days[offset]
+                                           if isinstance(projection_days, dict)
+                                           else projection_days))
+            if offset in debug_dfs:
+                kwargs.update(debug_dfs=True, debug_format=debug_format)
+            tables[offset] = cls(offset).table_with_projections(**kwargs)
+        return tables
+
+    @instrumented('CovidData.backfill')
+    def _cases_with_backfilled_unreported_days(self, backfill_prev_threshold=None):
+        if backfill_prev_threshold is None:
+            backfill_prev_threshold = self.backfill_prev_threshold
+
+        cases = self._regions_total('confirmed').to_frame()
         diffs = cases.diff(axis=1)
         diffs.iloc[:, 0] = cases.iloc[:, 0]  # replace resulting nans in first date's data
 
-        fixed = diffs.apply(backfill_missing, axis=1)
+        if self.incremental:
+            scan_state = self._resume_scan(
+                'backfill', params=[backfill_prev_threshold], regions=cases.index,
+                inputs=[cases.values],
+                scan=lambda state: self.backfill_scan(diffs.values, backfill_prev_threshold, state))
+            fixed_values = self.backfill_fill(scan_state)
+        else:
+            fixed_values = self.backfill_missing(diffs.values, backfill_prev_threshold)
+        fixed = pd.DataFrame(fixed_values, index=diffs.index, columns=diffs.columns)
         imputed_cases = fixed.cumsum(axis=1)
         return imputed_cases
 
+    @classmethod
+    def backfill_missing(cls, diffs, backfill_prev_threshold=50):
+        """
+        Fills 0 diff days between days with large measurements by spreading the
+        future's "catch up" day's cases on the zero days.
+
+        All regions are processed together, one date column at a time. Zero days that
+        are considered missing are only marked during the pass, and are filled at the end
+        from the day that ended their gap (the "catch up" day, an adjustment day, or the end).
+
+        :param diffs: 2D array of daily cases (regions x dates)
+        :param backfill_prev_threshold: number of cases per day after which a 0 day
+            is considered a missing measurement rather than a true zero
+        :return: 2D array of backfilled daily cases
+        """
+        return cls.backfill_fill(cls.backfill_scan(diffs, backfill_prev_threshold))
+
+    @staticmethod
+    def backfill_scan(diffs, backfill_prev_threshold=50, state=None):
+        """
+        The sequential pass of backfill_missing(), which can be resumed for new dates.
+
+        :param diffs: 2D array of daily cases (regions x dates)
+        :param backfill_prev_threshold: see backfill_missing()
+        :param state: state returned for the first dates of `diffs` (to only scan new dates)
+        :return: state dict (pass to backfill_fill() for the backfilled daily cases)
+        """
+        n_rows, n_cols = diffs.shape
+        if state is None:
+            out = np.array(diffs, dtype=float)
+            last = out[:, 0].copy()  # last value that was not missing
+            missing = np.zeros(n_rows, dtype=int)  # length of current missing days run
+            is_missing = np.zeros(out.shape, dtype=bool)
+            # value for filling each missing run, set on the day that ends the run
+            run_fill = np.full((n_rows, n_cols), np.nan)
+            first_col = 1
+        else:
+            first_col = state['out'].shape[1]
+            new_cols = np.array(diffs[:, first_col:], dtype=float)
+            out = np.concatenate([state['out'], new_cols], axis=1)
+            last, missing = state['last'].copy(), state['missing'].copy()
+            is_missing = np.concatenate(
+                [state['is_missing'], np.zeros(new_cols.shape, dtype=bool)], axis=1)
+            run_fill = np.concatenate(
+                [state['run_fill'], np.full(new_cols.shape, np.nan)], axis=1)
+
+        for i in range(first_col, n_cols):
+            cur = out[:, i]
+            zero = cur == 0
+            positive = cur > 0
+
+            # a lot of cases on previous non-missing day, so a zero is a missing measurement
+            cur_missing = zero & (last >= backfill_prev_threshold)
+            # catching up by backfilling from current value
+            catch_up = positive & (missing > 0)
+            # some kind of data adjustment (e.g. France), missing days are reset
+            adjust = ~zero & ~positive & (missing > 0)
+
+            spread = cur[catch_up] / (missing[catch_up] + 1)
+            out[catch_up, i] = spread
+            run_fill[catch_up, i] = spread
+            run_fill[adjust, i] = 0
+            is_missing[:, i] = cur_missing
+
+            last = np.where(cur_missing, last, out[:, i])
+            missing = np.where(cur_missing, missing + 1, 0)
+
+        return {'out': out, 'last': last, 'missing': missing,
+                'is_missing': is_missing, 'run_fill': run_fill}
+
+    @staticmethod
+    def backfill_fill(state):
+        """ fills the missing days found by backfill_scan() """
+        out = state['out'].copy()
+        n_rows, n_cols = out.shape
+        # runs that are not finished until the end are filled with zeros (last column)
+        run_fill = np.concatenate([state['run_fill'], np.zeros((n_rows, 1))], axis=1)
+
+        # fill missing days with the value of the day that ended their run
+        run_end = np.where(np.isnan(run_fill), n_cols, np.arange(n_cols + 1))
+        run_end = np.minimum.accumulate(run_end[:, ::-1], axis=1)[:, ::-1]
+        rows, cols = np.nonzero(state['is_missing'])
+        out[rows, cols] = run_fill[rows, run_end[rows, cols]]
+        return out
+
     def lagged_cases(self, lag=PREV_LAG):
-        return self.dft_cases_backfilled[self.dt_cols[-lag]]
+        return self.cases.lag(lag)
 
     def lagged_deaths(self, lag=PREV_LAG):
-        return self.dft_deaths[self.dt_cols[-lag]]
+        return self.deaths.lag(lag)
 
     def add_last_dates(self, df):
-
-        def last_date(s):
-            non_zero_s = s[4:][s[4:] > 0]
-            if len(non_zero_s):
-                return pd.to_datetime(non_zero_s.index[-1]).date().isoformat()
-            else:
-                return float('nan')
-
-        df['last_case_date'] = (self.dft_cases_raw.groupby(COL_REGION).sum().diff(axis=1)
-                                .apply(last_date, axis=1))
-        df['last_death_date'] = (self.dft_deaths_raw.groupby(COL_REGION).sum().diff(axis=1)
-                                 .apply(last_date, axis=1))
+        """
+        Adds the dates of the last reported case and death of each region, and the number
+        of days since them (until the last date of the data).
+        """
+        for name, col in [('confirmed', 'case'), ('deaths', 'death')]:
+            totals = self._regions_total(name)
+            # first two dates are not considered
+            last_ind = totals.diff().last_positive_index(skip_dates=2)
+            reported = last_ind >= 0
+            last_dates = totals.dates[last_ind]
+            df[f'last_{col}_date'] = pd.Series(
+                np.where(reported, last_dates.strftime('%Y-%m-%d'), np.nan),
+                index=totals.regions)
+            df[f'days_since_last_{col}'] = pd.Series(
+                np.where(reported, (totals.dates[-1] - last_dates).days, np.nan),
+                index=totals.regions)
         return df
 
     def overview_table(self):
@@ -461,6 +1445,8 @@ class CovidData:
         }).fillna(df_beds[COL_REGION])
         return df_beds.set_index(COL_REGION)
 
+    @instrumented('CovidData.overview_table_with_extra_data')
+    @snapshotted('overview', sources=(OWID, ReferenceData))
     def overview_table_with_extra_data(self):
         df = (self.overview_table()
               .drop(['Cases.total.prev', 'Deaths.total.prev'], axis=1)
@@ -468,17 +1454,18 @@ class CovidData:
               .sort_values('Cases.new', ascending=False))
         df['Fatality Rate'] /= 100
 
+        df_ref = ReferenceData.load()
+
         # add emoji flags
-        df['emoji_flag'] = EmojiFlags.load().set_index(COL_REGION)[EmojiFlags.emoji_col]
+        df['emoji_flag'] = df_ref['emoji_flag']
         df['emoji_flag'] = df['emoji_flag'].fillna('')
 
         # last dates
         df = self.add_last_dates(df)
 
         # age adjusted data
-        (df['age_adjusted_ifr'],
-         df['population'],
-         df['age_adjusted_icu_percentage']) = AgeAdjustedData.load()
+        for col in ['age_adjusted_ifr', 'population', 'age_adjusted_icu_percentage']:
+            df[col] = df_ref[col]
 
         # add per population columns
         df.dropna(subset=['population'], inplace=True)
@@ -486,8 +1473,7 @@ class CovidData:
             df[f'{col}{self.PER_100K_SUFFIX}'] = df[col] * 1e5 / df['population']
 
         # add ICU capacity data
-        df_beds = self.beds_df()
-        df['icu_capacity_per100k'] = df_beds['icu_per_100k']
+        df['icu_capacity_per100k'] = df_ref['icu_capacity_per100k']
 
         # add OWID data
         df['owid_icu_per_100k'] = OWID.latest_icu_per_mil() / 10
@@ -495,60 +1481,170 @@ class CovidData:
 
         return df
 
+    @instrumented('CovidData.calculate_testing_biases_dft')
     def calculate_testing_biases_dft(
             self, ifrs: pd.Series, min_window_lag = 60, min_window_deaths = 300
     ) -> pd.DataFrame:
-        deaths_dft = self.dft_deaths
-        cases_dft = self.dft_cases_backfilled
-
-        def biases_vec(country: str) -> pd.Series:
-            d_vec = deaths_dft.loc[country].values
-            c_vec = cases_dft.loc[country].values
-            ifr = ifrs.loc[country]
-            left, right = self.death_lag, self.death_lag + min_window_lag
-            biases = np.ones_like(c_vec)
-
-            # short circuit and fallback if not enough data for windowed calculations
-            if d_vec[-1] < min_window_deaths:
-                if d_vec[-1] > 0:
-                    biases[:] = (d_vec[-1] / c_vec[-1]) / ifr
-                else:
-                    pass  # just return ones
-
-            else:
-                def diff_deaths(right, left):
-                    return d_vec[right] - d_vec[left]
-
-                def diff_cases(right, left):
-                    return c_vec[right - self.death_lag] - c_vec[left - self.death_lag]
-
-                while right <= (len(c_vec) - 1):
-                    if ((right - left) < min_window_lag or
-                            diff_deaths(right, left) < min_window_deaths):
-                        # grow window to the right if needed
-                        right += 1
-                        continue
-
-                    while ((right - left) > min_window_lag and
-                           diff_deaths(right, left) > min_window_deaths):
-                        # shrink window from the left if possible
-                        left += 1
-
-                    biases[right] = ((diff_deaths(right, left) / diff_cases(right, left))
-                                     / ifr)
-                    # advance left every time to prevent infinite loop
-                    left += 1
+        # windows are found once on the full history, they only depend on past dates
+        window_ratios, window_found = self._shared(
+            ('testing_bias_windows', self.death_lag, min_window_lag, min_window_deaths),
+            lambda: self._full_history_testing_bias_windows(min_window_lag, min_window_deaths))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            biases = self.testing_biases_from_windows(
+                window_ratios=window_ratios.loc(ifrs.index).first_dates(len(self.dt_cols)).values,
+                window_found=window_found.loc(ifrs.index).first_dates(len(self.dt_cols)).values,
+                deaths=self.deaths.loc(ifrs.index).values,
+                cases=self.cases.loc(ifrs.index).values,
+                ifrs=ifrs.values,
+                min_window_deaths=min_window_deaths)
+
+        testing_biases_dft = pd.DataFrame(biases, index=ifrs.index, columns=self.dt_cols)
+        testing_biases_dft[testing_biases_dft < 1] = 1
+        return testing_biases_dft
 
-                # use first non 1 (initialised) value to fill the initial values
-                fill_ind = np.where(biases != 1)[0][0]
-                biases[:fill_ind] = biases[fill_ind]
+    def _full_history_testing_bias_windows(self, min_window_lag, min_window_deaths):
+        deaths = self._shared_deaths()
+        cases = self._shared_cases().loc(deaths.regions)
+        if self.incremental:
+            starts = self._resume_scan(
+                'testing_bias_windows',
+                params=[self.death_lag, min_window_lag, min_window_deaths],
+                regions=deaths.regions, inputs=[deaths.values],
+                scan=lambda state: self.testing_bias_window_starts(
+                    deaths.values, self.death_lag, min_window_lag, min_window_deaths,
+                    state=state))['starts']
+        else:
+            starts = self.testing_bias_window_starts(
+                deaths.values, self.death_lag, min_window_lag, min_window_deaths)['starts']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios, found = self.testing_bias_window_ratios(
+                deaths.values, cases.values, starts, self.death_lag)
+        return (RegionSeries(ratios, deaths.regions, deaths.labels),
+                RegionSeries(found, deaths.regions, deaths.labels))
 
-            return pd.Series(biases, index=self.dt_cols)
+    @staticmethod
+    def testing_bias_window_starts(deaths, death_lag, min_window_lag=60, min_window_deaths=300,
+                                   state=None):
+        """
+        Finds for all countries together the shortest windows (of at least `min_window_lag`
+        days) that contain at least `min_window_deaths` deaths, ending on each date. Results
+        for each date only depend on data up to that date. The windows only depend on the
+        deaths, so the scan can be resumed for new dates even if past cases are revised.
+
+        This is a grow / shrink two pointer scan over the dates, where the window end
+        is advanced for all countries at once. The window starts are shrunk in lockstep
+        by one step, and the less frequent long jumps (e.g. the first window with enough
+        deaths) are resolved by searching all the possible starts of the remaining countries.
+
+        :param deaths: 2D array of total deaths (countries x dates)
+        :param death_lag: days from being reported as a case to being reported as a death
+        :param state: state returned for the first dates of `deaths` (to only scan new dates)
+        :return: state dict, with 'starts': 2D array of the window start of each
+            country and window end date (-1 if not found)
+        """
+        n_rows, n_cols = deaths.shape
+        if state is None:
+            starts = np.full((n_rows, n_cols), -1)
+            left = np.full(n_rows, death_lag)
+            first_right = death_lag + min_window_lag
+        else:
+            done_cols = state['starts'].shape[1]
+            starts = np.concatenate(
+                [state['starts'], np.full((n_rows, n_cols - done_cols), -1)], axis=1)
+            left = state['left'].copy()
+            first_right = max(death_lag + min_window_lag, done_cols)
+
+        def is_final_left(rows, right, left):
+            # window cannot be shrunk from the left, and next left wouldn't leave a valid window
+            right_deaths = deaths[rows, right]
+            cannot_shrink = (((right - left) <= min_window_lag) |
+                             (right_deaths - deaths[rows, left] <= min_window_deaths))
+            next_invalid = (((right - left - 1) < min_window_lag) |
+                            (right_deaths - deaths[rows, np.minimum(left + 1, right)]
+                             < min_window_deaths))
+            return cannot_shrink & next_invalid
+
+        for right in range(first_right, n_cols):
+            # countries whose window is valid, the rest grow their window to the right
+            rows = np.nonzero((right - left) >= min_window_lag)[0]
+            rows = rows[deaths[rows, right] - deaths[rows, left[rows]] >= min_window_deaths]
+            if not len(rows):
+                continue
+
+            # shrink windows from the left if possible
+            lefts = left[rows]
+            pending = ~is_final_left(rows, right, lefts)
+            if pending.any():  # usually a single step
+                lefts = lefts + pending
+                pending = ~is_final_left(rows, right, lefts)
+            if pending.any():
+                pending_rows, pending_starts = rows[pending], lefts[pending]
+                candidates = np.arange(pending_starts.min(), right - min_window_lag + 1)[None, :]
+                found_lefts = ((candidates >= pending_starts[:, None]) &
+                               is_final_left(pending_rows[:, None], right, candidates))
+                lefts[pending] = candidates[0, found_lefts.argmax(1)]
+
+            starts[rows, right] = lefts
+            # advance left every time to prevent infinite loop
+            left[rows] = lefts + 1
+
+        return {'starts': starts, 'left': left}
 
-        testing_biases_dft = ifrs.index.to_series().apply(biases_vec)
-        testing_biases_dft[testing_biases_dft < 1] = 1
-        return testing_biases_dft
+    @staticmethod
+    def testing_bias_window_ratios(deaths, cases, starts, death_lag):
+        """
+        :return: 2D array of deaths to lagged cases ratios of the windows with `starts`
+            (found by testing_bias_window_starts()), and a 2D boolean array of whether a window
+            was found for that date
+        """
+        found = starts >= 0
+        rows, rights = np.nonzero(found)
+        lefts = starts[rows, rights]
+        ratios = np.ones(starts.shape)
+        ratios[rows, rights] = ((deaths[rows, rights] - deaths[rows, lefts]) /
+                                (cases[rows, rights - death_lag] - cases[rows, lefts - death_lag]))
+        return ratios, found
 
+    @staticmethod
+    def testing_biases_from_windows(window_ratios, window_found, deaths, cases, ifrs,
+                                    min_window_deaths=300):
+        """
+        Calculates testing biases from the windows (testing_bias_window_ratios()),
+        or from the totals for countries that don't have enough deaths for windows.
+
+        :param window_ratios: 2D array of ratios of deaths to lagged cases of the windows
+        :param window_found: 2D boolean array of whether a window was found for that date
+        :param deaths: 2D array of total deaths (countries x dates)
+        :param cases: 2D array of total cases (countries x dates)
+        :param ifrs: 1D array of infection fatality rates of the countries
+        :param min_window_deaths: minimal number of deaths in a window
+        :return: 2D array of testing biases (countries x dates)
+        """
+        n_rows, n_cols = cases.shape
+        last_deaths, last_cases = deaths[:, -1], cases[:, -1]
+        windowed = last_deaths >= min_window_deaths
+
+        biases = np.ones((n_rows, n_cols))
+        found = window_found & windowed[:, None]
+        biases[found] = (window_ratios / ifrs[:, None])[found]
+
+        # short circuit and fallback if not enough data for windowed calculations
+        fallback = ~windowed & (last_deaths > 0)  # otherwise just ones
+        biases[fallback] = ((last_deaths[fallback] / last_cases[fallback]) /
+                            ifrs[fallback])[:, None]
+
+        # use first non 1 (initialised) value to fill the initial values
+        not_initial = biases != 1
+        fill_ind = not_initial.argmax(1)
+        fill_rows = windowed & not_initial.any(1)
+        fill_mask = (np.arange(n_cols)[None, :] < fill_ind[:, None]) & fill_rows[:, None]
+        biases = np.where(fill_mask, biases[np.arange(n_rows), fill_ind][:, None], biases)
+        return biases
+
+    @instrumented('CovidData.table_with_estimated_cases')
+    @snapshotted('estimated_cases', attrs=('testing_biases_dft', 'cases_est_dft'),
+                 sources=(OWID, ReferenceData))
     def table_with_estimated_cases(self):
         """
         Assumptions:
@@ -566,14 +1662,19 @@ class CovidData:
             df['age_adjusted_ifr'])
 
         # adjust daily cases by closest approximation of testing bias at that point
-        cases_dft = self.dft_cases_backfilled
-        self.cases_est_dft = (cases_dft.diff(axis=1) * self.testing_biases_dft
-                              ).cumsum(axis=1).fillna(0).astype(int)
+        # (nans, e.g. regions without biases, are zeros)
+        biases = self.testing_biases_dft.reindex(self.cases.regions).values
+        cases_est_diffs = self.cases.diff().values * biases
+        nans = np.isnan(cases_est_diffs)
+        cases_est = np.cumsum(np.where(nans, 0, cases_est_diffs), axis=1)
+        cases_est[nans] = 0
+        self.cases_est = RegionSeries(
+            RegionSeries.compact(cases_est.astype(int)), self.cases.regions, self.cases.labels)
 
         df['current_testing_bias'] = self.testing_biases_dft.iloc[:, -1]
 
         # total cases
-        df[f'{self.CASES_TOT}.est'] = self.cases_est_dft[self.dt_cols[-1]]
+        df[f'{self.CASES_TOT}.est'] = self.cases_est.column(-1)
         df[f'{self.CASES_TOT}{self.PER_100K_SUFFIX}.est'] = (
                 df[f'{self.CASES_TOT}.est'] * 1e5 / df['population'])
 
@@ -596,32 +1697,82 @@ class CovidData:
                                 'Central African Republic': 'CAR (Africa)',
                                 })
 
+    @instrumented('CovidData.smoothed_growth_rates')
     def smoothed_growth_rates(self, n_days):
-        recent_dates = self.dt_cols[-n_days:]
+        # dates x regions, so broadcasting works correctly
+        cases = self.cases_est.last_dates(n_days).values.T + 1.0  # with pseudo counts
+
+        diffs = self.cases_est.diff().last_dates(n_days).values.T.astype(float)
+        diffs[diffs < 0] = 0  # total cases cannot go down
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # daily rate is new / (total - new)
+            daily_growth_rates = cases / (cases - diffs)
+
+            # dates with larger number of cases have higher sampling accuracy
+            # so their measurement deserve more confidence
+            sampling_weights = (cases / cases.sum(0))
 
-        cases = self.cases_est_dft[recent_dates] + 1  # with pseudo counts
+            weighted_mean = np.nansum(daily_growth_rates * sampling_weights, axis=0)
 
-        diffs = self.cases_est_dft.diff(axis=1)[recent_dates]
+            weighted_std = np.nansum((daily_growth_rates - weighted_mean) ** 2 *
+                                     sampling_weights, axis=0) ** 0.5
+
+        regions = self.cases_est.regions
+        return pd.Series(weighted_mean - 1, index=regions), pd.Series(weighted_std, index=regions)
+
+    def smoothed_growth_rates_history(self, n_days) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Weighted growth rates and their stds as in smoothed_growth_rates(), for every date
+        (each from the `n_days` until that date), computed for all the trailing windows at once.
+        Windows shorter than 8 days give the same values, longer ones are summed in
+        a different order by numpy (pairwise), so they can differ by float rounding.
+
+        :return: tuple of growth rates and stds dataframes (regions x dates)
+        """
+        n_regions, n_dates = self.cases_est.shape
+        # dates x regions, with n_days - 1 zero weight dates before the first date,
+        # so that the first windows are shorter as in smoothed_growth_rates()
+        cases = np.zeros((n_days - 1 + n_dates, n_regions))
+        cases[n_days - 1:] = self.cases_est.values.T + 1.0  # with pseudo counts
+        diffs = np.zeros_like(cases)
+        diffs[n_days - 1:] = self.cases_est.diff().values.T
         diffs[diffs < 0] = 0  # total cases cannot go down
 
-        cases, diffs = cases.T, diffs.T  # broadcasting works correctly this way
+        # window days x dates x regions
+        windows = np.arange(n_days)[:, None] + np.arange(n_dates)[None, :]
+        cases, diffs = cases[windows], diffs[windows]
 
-        # daily rate is new / (total - new)
-        daily_growth_rates = cases / (cases - diffs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_growth_rates = cases / (cases - diffs)
+            sampling_weights = cases / cases.sum(0)
+            weighted_mean = np.nansum(daily_growth_rates * sampling_weights, axis=0)
+            weighted_std = np.nansum((daily_growth_rates - weighted_mean) ** 2 *
+                                     sampling_weights, axis=0) ** 0.5
 
-        # dates with larger number of cases have higher sampling accuracy
-        # so their measurement deserve more confidence
-        sampling_weights = (cases / cases.sum(0))
+        def to_frame(arr):
+            return pd.DataFrame(arr.T, index=self.cases_est.regions, columns=self.cases_est.labels)
 
-        weighted_mean = (daily_growth_rates * sampling_weights).sum(0)
+        return to_frame(weighted_mean - 1), to_frame(weighted_std)
 
-        weighted_std = ((daily_growth_rates - weighted_mean).pow(2) *
-                        sampling_weights).sum(0).pow(0.5)
+    def transmission_rates_history(self, n_days=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Transmission rates and their stds as in table_with_current_rates_and_ratios(),
+        for every date, to chart how transmission evolved.
 
-        return weighted_mean - 1, weighted_std
+        :param n_days: growth rates smoothing days, PREV_LAG by default
+        :return: tuple of transmission rates and stds dataframes (regions x dates)
+        """
+        df = self.table_with_estimated_cases()
+        past_active, past_recovered = self._calculate_recovered_and_active_until_now(df)
+        growth, growth_std = self.smoothed_growth_rates_history(n_days or self.PREV_LAG)
+        return Model.growth_to_transmission_rate(
+            growth=growth, rec=past_recovered, act=past_active, growth_std=growth_std)
 
+    @snapshotted('rates', attrs=('testing_biases_dft', 'cases_est_dft'),
+                 sources=(OWID, ReferenceData))
     def table_with_current_rates_and_ratios(
-            self) -> Tuple[pd.DataFrame, List[pd.Series], List[pd.Series]]:
+            self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         df = self.table_with_estimated_cases()
 
         df['affected_ratio'] = df['Cases.total'] / df['population']
@@ -630,8 +1781,8 @@ class CovidData:
 
         past_active, past_recovered = self._calculate_recovered_and_active_until_now(df)
 
-        df['current_active_ratio'] = past_active[-1].fillna(0)
-        df['current_recovered_ratio'] = past_recovered[-1].fillna(0)
+        df['current_active_ratio'] = past_active.iloc[:, -1].fillna(0)
+        df['current_recovered_ratio'] = past_recovered.iloc[:, -1].fillna(0)
 
         df['transmission_rate'], df['transmission_rate_std'] = Model.growth_to_transmission_rate(
             growth=df['growth_rate'],
@@ -641,8 +1792,16 @@ class CovidData:
 
         return df, past_active, past_recovered
 
-    def table_with_projections(self, projection_days=(7, 14, 30), debug_dfs=False):
-
+    @instrumented('CovidData.table_with_projections')
+    @snapshotted('projections', attrs=('testing_biases_dft', 'cases_est_dft'),
+                 sources=(OWID, ReferenceData))
+    def table_with_projections(self, projection_days=(7, 14, 30), debug_dfs=False,
+                               debug_format='frames'):
+        """
+        :param debug_dfs: True to also return the model traces of the countries
+        :param debug_format: 'frames' for a list of dataframes of each country,
+            or 'long' for a single long format dataframe (see Model.traces_long_frame)
+        """
         df, past_active, past_recovered = self.table_with_current_rates_and_ratios()
 
         df, traces = Model.run_model_forward(
@@ -652,39 +1811,80 @@ class CovidData:
             projection_days=projection_days)
 
         if debug_dfs:
-            debug_dfs = Model.timeseries_for_countries(
-                debug_countries=df.index,
-                traces=traces,
-                simulation_start_day=len(past_recovered) - 1,
-                infection_rate=df['transmission_rate'])
+            debug_kwargs = dict(traces=traces,
+                                simulation_start_day=past_recovered.shape[1] - 1,
+                                infection_rate=df['transmission_rate'])
+            if debug_format == 'long':
+                debug_dfs = Model.traces_long_frame(countries=df.index, **debug_kwargs)
+            else:
+                debug_dfs = Model.timeseries_for_countries(debug_countries=df.index,
+                                                           **debug_kwargs)
             return df, debug_dfs
         return df
 
-    def _calculate_recovered_and_active_until_now(self, df):
+    @instrumented('CovidData.recovered_and_active')
+    def _calculate_recovered_and_active_until_now(
+            self, df) -> Tuple[pd.DataFrame, pd.DataFrame]:
         # estimated daily cases ratios of population
         lagged_cases_ratios = (self.cases_est_dft[self.dt_cols].T / df['population'].T).T
         # protect from testing bias over-inflation
         lagged_cases_ratios[lagged_cases_ratios > 1] = 1
 
-        # run through history and estimate recovered and active using:
-        # https://covid19dashboards.com/outstanding_cases/#Appendix:-Methodology-of-Predicting-Recovered-Cases
-        actives, recs = [], []
-        zeros_series = lagged_cases_ratios[self.dt_cols[0]] * 0  # this is to have consistent types
-        for day in range(len(self.dt_cols)):
+        cases = lagged_cases_ratios.values.T  # dates x countries, so each day is contiguous
+        recs = np.empty_like(cases)
+
+        # countries whose cases ratios are the same as in the previous calculation
+        # (e.g. of another days offset, or of the previous run in incremental mode) until
+        # some date, continue its history from that date
+        state_params = [Model.recovery_lagged9_rate]
+        prev = self._shared_results.get('recovery_history')
+        if prev is None and self.incremental:
+            prev = self._load_state('recovery_history', state_params)
+        same, n_same = np.zeros(cases.shape[1], dtype=bool), 0
+        if prev is not None and prev['countries'].equals(lagged_cases_ratios.index):
+            n_same = min(len(prev['cases']), len(cases))
+            prev_cases, cur_cases = prev['cases'][:n_same], cases[:n_same]
+            same = ((prev_cases == cur_cases) |
+                    (np.isnan(prev_cases) & np.isnan(cur_cases))).all(axis=0)
+            recs[:, same] = self.recovered_history(cases[:, same], prev['recs'][:n_same, same])
+        recs[:, ~same] = self.recovered_history(cases[:, ~same])
+        if prev is None or len(cases) >= len(prev['cases']):
+            history = {'countries': lagged_cases_ratios.index, 'cases': cases, 'recs': recs}
+            self._shared_results['recovery_history'] = history
+            if self.incremental:
+                self._store_state('recovery_history', state_params, history)
+        actives = cases - recs
+
+        def to_frame(arr):
+            return pd.DataFrame(arr.T, index=lagged_cases_ratios.index, columns=self.dt_cols)
+
+        return to_frame(actives), to_frame(recs)
+
+    @staticmethod
+    def recovered_history(cases, recs_prefix=None):
+        """
+        Runs through history and estimates recovered using:
+        https://covid19dashboards.com/outstanding_cases/#Appendix:-Methodology-of-Predicting-Recovered-Cases
+
+        :param cases: 2D array of estimated cases ratios (dates x countries)
+        :param recs_prefix: recovered ratios of the first dates if they were already
+            calculated (for the same cases), to continue from
+        :return: 2D array of recovered ratios (dates x countries)
+        """
+        recs = np.empty_like(cases)
+        n_prefix = 0 if recs_prefix is None else len(recs_prefix)
+        recs[:n_prefix] = recs_prefix
+        zeros = cases[0] * 0  # this is to have consistent types
+        for day in range(n_prefix, len(cases)):
             # previous day
-            prev_rec = recs[day - 1] if day > 0 else zeros_series
+            prev_rec = recs[day - 1] if day > 0 else zeros
             # lagged recoveries
-            tot_lagged_9 = lagged_cases_ratios[self.dt_cols[day - 9]] if day >= 9 else zeros_series
+            tot_lagged_9 = cases[day - 9] if day >= 9 else zeros
             new_recs = prev_rec + (tot_lagged_9 - prev_rec) * Model.recovery_lagged9_rate
             # clip recoveries by current cases
-            cur_cases = lagged_cases_ratios[self.dt_cols[day]]
-            new_recs[new_recs > cur_cases] = cur_cases[new_recs > cur_cases]
-            new_actives = cur_cases - new_recs
-            # assign
-            recs.append(new_recs)
-            actives.append(new_actives)
-
-        return actives, recs
+            cur_cases = cases[day]
+            recs[day] = np.where(new_recs > cur_cases, cur_cases, new_recs)
+        return recs
 
 
 class Model:
@@ -694,43 +1894,54 @@ class Model:
     rec_rate_simple = 0.05
 
     @classmethod
+    @instrumented('Model.run_model_forward')
     def run_model_forward(cls,
                           df,
                           past_active,
                           past_recovered,
                           projection_days,
                           ):
-
-        sus, act, rec = cls._run_sir_model(
-            past_recovered, past_active, df['growth_rate'], n_days=projection_days[-1])
-
-        # sample more growth rates
-        sus_lists = [[s] for s in sus]
-        act_lists = [[a] for a in act]
-        rec_lists = [[r] for r in rec]
-
-        for ratio in np.linspace(-1, 1, 10):
-            pert_growth = df['growth_rate'] + ratio * df['growth_rate_std']
-            pert_growth[pert_growth < 0] = 0
-            sus_other, act_other, rec_other = cls._run_sir_model(
-                past_recovered, past_active, pert_growth, n_days=projection_days[-1])
-            for s_list, s in zip(sus_lists, sus_other):
-                s_list.append(s)
-            for a_list, a in zip(act_lists, act_other):
-                a_list.append(a)
-            for r_list, r in zip(rec_lists, rec_other):
-                r_list.append(r)
-
-        def list_to_max_min(l):
-            concated = [pd.concat(sub_l, axis=1) for sub_l in l]
-            max_list, min_list = zip(*[(d.max(1), d.min(1)) for d in concated])
-            return max_list, min_list
-
-        sus_max, sus_min = list_to_max_min(sus_lists)
-        act_max, act_min = list_to_max_min(act_lists)
-        rec_max, rec_min = list_to_max_min(rec_lists)
-
-        day_one = len(past_recovered)
+        """
+        :return: the table with the projected columns, and the traces: dict of countries x
+            days dataframes of the past and simulated ratios, and their envelopes
+        """
+        countries = past_active.index
+        past_act, past_rec = past_active.values, past_recovered.values
+
+        # center growth rates and more sampled growth rates in one array
+        growth = df['growth_rate'].reindex(countries).values
+        growth_std = df['growth_rate_std'].reindex(countries).values
+        pert_growth = growth + np.linspace(-1, 1, 10)[:, None] * growth_std
+        pert_growth[pert_growth < 0] = 0
+        growths = np.concatenate([growth[None, :], pert_growth])
+
+        sus_proj, act_proj, rec_proj = cls._run_sir_model(
+            past_rec, past_act, growths, n_days=projection_days[-1])
+
+        def history_and_envelopes(past, projected):
+            # past is the same for all samples, so only the projection has envelopes
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=RuntimeWarning)  # all nan countries
+                max_proj, min_proj = np.nanmax(projected, 0), np.nanmin(projected, 0)
+            center, max_, min_ = [
+                np.concatenate([past, proj], axis=1)
+                for proj in [projected[0], max_proj, min_proj]]
+            return center, max_, min_
+
+        rec_center, rec_max, rec_min = history_and_envelopes(past_rec, rec_proj)
+        act_center, act_max, act_min = history_and_envelopes(past_act, act_proj)
+        sus_center, sus_max, sus_min = history_and_envelopes(1 - past_rec - past_act, sus_proj)
+
+        def frame(arr):
+            # countries x days (from the first past day), so a day is a column
+            return pd.DataFrame(arr, index=countries)
+
+        sus, act, rec = frame(sus_center), frame(act_center), frame(rec_center)
+        sus_max, sus_min = frame(sus_max), frame(sus_min)
+        act_max, act_min = frame(act_max), frame(act_min)
+        rec_max, rec_min = frame(rec_max), frame(rec_min)
+
+        day_one = past_recovered.shape[1]
         for day in [1] + list(projection_days):
             ind = day_one + day - 1
             suffix = f'.+{day}d' if day > 1 else ''
@@ -782,65 +1993,251 @@ class Model:
         return infect_rate, infect_std
 
     @classmethod
+    @instrumented('Model.run_sir_model')
     def _run_sir_model(cls, past_rec, past_act, growth, n_days):
-        rec, act = past_rec.copy(), past_act.copy()
+        """
+        Simulates forward all the growth rate samples for all countries together.
+
+        :param past_rec: 2D array of past recovered ratios (countries x days)
+        :param past_act: 2D array of past active ratios (countries x days)
+        :param growth: 2D array of growth rates (samples x countries)
+        :param n_days: number of days to simulate
+        :return: susceptible, active and recovered ratios for the simulated days
+            as 3D arrays (samples x countries x days)
+        """
+        n_samples, n_countries = growth.shape
+        lag = 9  # for lagged recoveries
+        # simulated days are appended after the last lagged days of the past
+        rec = np.empty((n_samples, n_countries, lag + n_days))
+        act = np.empty((n_samples, n_countries, lag + n_days))
+        rec[:, :, :lag] = past_rec[None, :, -lag:]
+        act[:, :, :lag] = past_act[None, :, -lag:]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            infect_rate, _ = cls.growth_to_transmission_rate(
+                growth, past_rec[:, -1], past_act[:, -1])
+
+            # simulate
+            for i in range(lag, lag + n_days):
+                # calculate susceptible
+                sus = 1 - rec[:, :, i - 1] - act[:, :, i - 1]
+
+                # calculate new recovered
+                actives_lagged_9 = act[:, :, i - lag]
+                delta_rec = actives_lagged_9 * cls.recovery_lagged9_rate
+                delta_rec_simple = act[:, :, i - 1] * cls.rec_rate_simple
+                # limit recovery rate to simple SIR model where
+                # lagged rate estimation becomes too high (on the downward slopes)
+                delta_rec = np.where(delta_rec > delta_rec_simple, delta_rec_simple, delta_rec)
+                rec[:, :, i] = rec[:, :, i - 1] + delta_rec
+
+                # calculate new active
+                delta_infect = act[:, :, i - 1] * sus * infect_rate
+                new_active = act[:, :, i - 1] + delta_infect - delta_rec
+                act[:, :, i] = np.where(new_active < 0, 0, new_active)
+
+        rec, act = rec[:, :, lag:], act[:, :, lag:]
+        sus = 1 - rec - act
 
-        infect_rate, _ = cls.growth_to_transmission_rate(growth, rec[-1], act[-1])
+        return sus, act, rec
 
-        # simulate
-        for i in range(n_days):
-            # calculate susceptible
-            sus = 1 - rec[-1] - act[-1]
+    # columns of the debug dataframes, and their traces
+    trace_columns = {
+        'Susceptible': 'sus_center', 'Susceptible.max': 'sus_max', 'Susceptible.min': 'sus_min',
+        'Infected': 'act_center', 'Infected.max': 'act_max', 'Infected.min': 'act_min',
+        'Removed': 'rec_center', 'Removed.max': 'rec_max', 'Removed.min': 'rec_min',
+    }
 
-            # calculate new recovered
-            actives_lagged_9 = act[-9]
-            delta_rec = actives_lagged_9 * cls.recovery_lagged9_rate
-            delta_rec_simple = act[-1] * cls.rec_rate_simple
-            # limit recovery rate to simple SIR model where
-            # lagged rate estimation becomes too high (on the downward slopes)
-            delta_rec[delta_rec > delta_rec_simple] = delta_rec_simple[delta_rec > delta_rec_simple]
-            new_recovered = rec[-1] + delta_rec
+    @classmethod
+    @instrumented('Model.traces_long_frame')
+    def traces_long_frame(cls, traces, simulation_start_day, infection_rate,
+                          countries=None, days=None) -> pd.DataFrame:
+        """
+        Traces in long format: a row per country and day, with 'day' (relative to the
+        simulation start), the traces columns, 'title' and 'country'.
 
-            # calculate new active
-            delta_infect = act[-1] * sus * infect_rate
-            new_active = act[-1] + delta_infect - delta_rec
-            new_active[new_active < 0] = 0
+        :param countries: countries to include (in that order), all of them if None
+        :param days: tuple of first and last day (inclusive) to include, all if None
+        """
+        all_countries = traces['rec_center'].index
+        countries = all_countries if countries is None else pd.Index(countries)
+        rows = all_countries.get_indexer(countries)
+
+        day_numbers = np.arange(traces['rec_center'].shape[1]) - simulation_start_day
+        day_inds = (np.arange(len(day_numbers)) if days is None else
+                    np.flatnonzero((day_numbers >= days[0]) & (day_numbers <= days[1])))
+
+        # titles are of the first day's values, also if it's not included
+        first = {name: traces[name].values[rows, 0]
+                 for name in ['sus_center', 'act_center', 'rec_center']}
+        titles = [f"{country}: "
+                  f"Transmission Rate: {rate:.1%}. "
+                  f"S/I/R init: {sus:.1%},{act:.1%},{rec:.1%}"
+                  for country, rate, sus, act, rec in zip(
+                      countries, infection_rate.reindex(countries).values,
+                      first['sus_center'], first['act_center'], first['rec_center'])]
+
+        df = pd.DataFrame({'day': np.tile(day_numbers[day_inds], len(countries))})
+        for col, name in cls.trace_columns.items():
+            df[col] = traces[name].values[rows][:, day_inds].ravel()
+        df['title'] = np.repeat(np.array(titles, dtype=object), len(day_inds))
+        df['country'] = np.repeat(countries.values.astype(object), len(day_inds))
+        return df
 
-            # update
-            rec.append(new_recovered)
-            act.append(new_active)
+    @classmethod
+    @instrumented('Model.timeseries_for_countries')
+    def timeseries_for_countries(cls, debug_countries, traces,
+                                 simulation_start_day, infection_rate):
+        """ :return: list of traces_long_frame() dataframes of each country, indexed by day """
+        df = cls.traces_long_frame(traces, simulation_start_day, infection_rate,
+                                   countries=debug_countries)
+        n_days = traces['rec_center'].shape[1]
+        return [df.iloc[start:start + n_days].set_index('day')
+                for start in range(0, len(df), n_days)]
 
-        sus = [1 - r - a for r, a in zip(rec, act)]
 
-        return sus, act, rec
+class SharedMemorySource:
+    """
+    Raw JHU dataframes whose dates values are kept in shared memory blocks, so that they
+    can be loaded once and passed to worker processes without pickling the matrices.
+    Can be used as a source for CovidData.load().
+    """
+
+    def __init__(self, specs):
+        self.specs = specs  # name -> (shm name, shape, dtype, meta dataframe, dates)
+        self._blocks = {}
+
+    @classmethod
+    def create(cls, frames):
+        """
+        Copies the dates values of raw JHU dataframes into new shared memory blocks.
+        The creating process should call unlink() when the workers are done.
+
+        :param frames: dict of raw JHU format dataframes
+        """
+        specs, blocks = {}, {}
+        for name, df in frames.items():
+            dates = SourceData.get_dates(df)
+            values = df[dates].values
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            meta = df.drop(columns=dates)
+            specs[name] = (shm.name, values.shape, values.dtype.str, meta, dates)
+            blocks[name] = shm
+        source = cls(specs)
+        source._blocks = blocks
+        return source
+
+    def get_covid_dataframe(self, name):
+        shm_name, shape, dtype, meta, dates = self.specs[name]
+        if name not in self._blocks:
+            self._blocks[name] = shared_memory.SharedMemory(name=shm_name)
+        values = np.ndarray(shape, dtype=dtype, buffer=self._blocks[name].buf)
+        df_values = pd.DataFrame(values, index=meta.index, columns=dates, copy=False)
+        return pd.concat([meta, df_values], axis=1)
+
+    def unlink(self):
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks = {}
+
+
+class Backtest:
+    """
+    Measures the forecasting errors of CovidData.table_with_projections() by running it for
+    many past days offsets, and comparing each projection with the estimate calculated
+    from the data of the day it was projected for.
+    """
+    metrics = ('affected_ratio.est', 'needICU.per100k')
+
+    _worker_source = None  # set in worker processes
+
+    @classmethod
+    def run(cls, n_offsets, projection_days=(7, 14, 30), max_workers=None, path=None):
+        """
+        Runs the projections for days offsets -1 to -`n_offsets` in a process pool. Raw JHU
+        data is loaded once and shared with the workers via shared memory.
+
+        :param n_offsets: number of past days to run the projections from
+        :param projection_days: horizons to evaluate (projection for +N days is compared
+            with the estimate N - 1 days later, as in Model.run_model_forward())
+        :param max_workers: number of worker processes, 0 to run in the current process
+        :param path: optional path to save the errors table to as csv
+        :return: tidy dataframe with a row for each country, days offset, horizon and metric
+        """
+        # offset 0 is not projected from, but is the actual value for the most recent projections
+        offsets = list(range(0, -n_offsets - 1, -1))
+        if max_workers == 0:
+            # on the data that is already loaded (the workers load it from shared memory)
+            tables = [cls._offset_metrics(o, projection_days) for o in offsets]
+        else:
+            source = SharedMemorySource.create({'confirmed': CovidData.dft_cases_raw,
+                                                'deaths': CovidData.dft_deaths_raw})
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers,
+                                         initializer=cls._init_worker,
+                                         initargs=(source.specs,)) as pool:
+                    tables = list(pool.map(cls._offset_metrics, offsets,
+                                           [projection_days] * len(offsets)))
+            finally:
+                source.unlink()
+
+        df_errors = cls.errors_table(dict(zip(offsets, tables)), projection_days)
+        if path:
+            df_errors.to_csv(path, index=False)
+        return df_errors
+
+    @classmethod
+    def _init_worker(cls, specs):
+        cls._worker_source = SharedMemorySource(specs)
+        CovidData.load(cls._worker_source)
+
+    @classmethod
+    def _offset_metrics(cls, days_offset, projection_days):
+        # only the needed columns are sent back, with the date they are estimated for
+        df = CovidData(days_offset).table_with_projections(projection_days=projection_days)
+        cols = [cls._column(m, d) for m in cls.metrics for d in [1] + list(projection_days)]
+        return df[list(dict.fromkeys(cols))]
 
     @staticmethod
-    def timeseries_for_countries(debug_countries, traces,
-                                 simulation_start_day, infection_rate):
-        dfs = []
-        for debug_country in debug_countries:
-            debug = [{'day': day - simulation_start_day,
-                      'Susceptible': traces['sus_center'][day][debug_country],
-                      'Susceptible.max': traces['sus_max'][day][debug_country],
-                      'Susceptible.min': traces['sus_min'][day][debug_country],
-                      'Infected': traces['act_center'][day][debug_country],
-                      'Infected.max': traces['act_max'][day][debug_country],
-                      'Infected.min': traces['act_min'][day][debug_country],
-                      'Removed': traces['rec_center'][day][debug_country],
-                      'Removed.max': traces['rec_max'][day][debug_country],
-                      'Removed.min': traces['rec_min'][day][debug_country],
-                      }
-                     for day in range(len(traces['rec_center']))]
+    def _column(metric, days):
+        # same naming as in Model.run_model_forward()
+        return f'{metric}.+{days}d' if days > 1 else metric
 
-            title = (f"{debug_country}: "
-                     f"Transmission Rate: {infection_rate[debug_country]:.1%}. "
-                     f"S/I/R init: {debug[0]['Susceptible']:.1%},"
-                     f"{debug[0]['Infected']:.1%},{debug[0]['Removed']:.1%}")
-            df = pd.DataFrame(debug).set_index('day')
-            df['title'] = title
-            df['country'] = debug_country
-            dfs.append(df)
-        return dfs
+    @classmethod
+    def errors_table(cls, tables, projection_days):
+        """
+        :param tables: dict from days offset to its table of metrics
+        :param projection_days: projection horizons in the tables
+        :return: tidy errors dataframe
+        """
+        dates = pd.to_datetime(CovidData.dt_cols_all)
+        rows = []
+        for offset, df in tables.items():
+            for days in projection_days:
+                target_offset = offset + days - 1
+                if offset >= 0 or target_offset not in tables:
+                    continue
+                for metric in cls.metrics:
+                    predicted = df[cls._column(metric, days)]
+                    actual = tables[target_offset][metric].reindex(predicted.index)
+                    rows.append(pd.DataFrame({
+                        'country': predicted.index,
+                        'days_offset': offset,
+                        'date': dates[len(dates) - 1 + offset],
+                        'projection_days': days,
+                        'metric': metric,
+                        'predicted': predicted.values,
+                        'actual': actual.values,
+                    }))
+        columns = ['country', 'days_offset', 'date', 'projection_days',
+                   'metric', 'predicted', 'actual']
+        df_errors = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=columns)
+        # same as "miss" in the news page
+        df_errors['miss'] = df_errors['actual'] / df_errors['predicted'] - 1
+        df_errors['abs_error'] = (df_errors['actual'] - df_errors['predicted']).abs()
+        return df_errors
 
 
 def altair_sir_plot(df_alt, default_country):
@@ -975,15 +2372,83 @@ class PandasStyling:
         return s
 
 
+class MapHover:
+    """
+    Numeric hover data of a map and its buttons: the columns are sent once, as the trace's
+    customdata, and hovertemplates refer to them by name, so the values are formatted in
+    the browser (d3-format) instead of building a hover string for each row and button.
+
+    Templates have placeholders of columns and formats, e.g.
+        'Cases: {Cases.total:,.0f}<br>Transmission rate: {transmission_rate:.1%}'
+    and, as in str.format, literal braces are written '{{' and '}}' (see escape()).
+    """
+    _token = re.compile(r'\{\{|\}\}|\{([^{}:]+)(?::([^{}]*))?\}|[{}]')
+
+    def __init__(self, df: pd.DataFrame, columns, default_template=''):
+        """
+        :param columns: all the columns the templates (and the maps' errors) refer to
+        :param default_template: hover text of the maps that don't have their own template
+        """
+        self.columns = list(dict.fromkeys(columns))
+        self.customdata = df[self.columns].values.astype(float)
+        self.default_template = default_template
+
+    @staticmethod
+    def escape(text) -> str:
+        """ :return: the text (a label or a formatted value) as a literal part of a template """
+        return str(text).replace('{', '{{').replace('}', '}}')
+
+    @staticmethod
+    def _literal(text) -> str:
+        # plotly reads any '%{' as a variable, so the '%' of a literal one is an html entity
+        return text.replace('%{', '&#37;{')
+
+    def ref(self, column, fmt='') -> str:
+        """ :return: hovertemplate reference to the column's values """
+        i = self.columns.index(column)
+        return f'%{{customdata[{i}]:{fmt}}}' if fmt else f'%{{customdata[{i}]}}'
+
+    def template(self, template) -> str:
+        """ :return: hovertemplate with the placeholders replaced by column references """
+        parts, literal, pos = [], '', 0
+        for m in self._token.finditer(template):
+            literal += template[pos:m.start()]
+            pos = m.end()
+            token = m.group(0)
+            if token in ('{{', '}}'):
+                literal += token[0]
+            elif m.group(1) is None:
+                raise ValueError(f"single {token!r} in hover template "
+                                 f"(a literal one is written {token * 2!r}): {template!r}")
+            else:
+                parts += [self._literal(literal), self.ref(m.group(1), m.group(2))]
+                literal = ''
+        parts.append(self._literal(literal + template[pos:]))
+        return ''.join(parts)
+
+    def hovertemplate(self, percent=False, err_col=None, template=None) -> str:
+        """ :return: hovertemplate of the map's value (z) and error, and the hover text """
+        percent_str = ('%' if percent else '')
+        err_str = f' ± {self.ref(err_col, ".1%" if percent else ".1f")}' if err_col else ''
+        text = self.template(self.default_template if template is None else template)
+        return f'<b>%{{id}}</b>:<br><b>%{{z:.1f}}{percent_str}{err_str}</b><br>{text}<extra></extra>'
+
+
 class GeoMap:
+    shapefile = os.path.join(data_folder, '50m_countries/ne_50m_admin_0_countries.shp')
+
+    # preprocessed geometry: the maps are ~800px wide (~0.5 degrees per pixel), so the
+    # shapes are simplified well below that, and stored as integer hundredths of degrees
+    geometry_folder = os.path.join(data_folder, 'geometry')
+    simplify_tolerance = 0.05  # degrees
+    quantization = 100
 
     @classmethod
-    def get_world_geo_df(cls):
+    def read_world_shapefile(cls):
+        """ full resolution countries GeoDataFrame """
         import geopandas
 
-        shapefile = 'data_files/50m_countries/ne_50m_admin_0_countries.shp'
-
-        world = geopandas.read_file(shapefile)[['ADMIN', 'ADM0_A3', 'geometry']]
+        world = geopandas.read_file(cls.shapefile)[['ADMIN', 'ADM0_A3', 'geometry']]
         world.columns = ['country', 'iso_code', 'geometry']
         world = world[world['country'] != "Antarctica"].copy()
         world['country'] = world['country'].map({
@@ -995,6 +2460,91 @@ class GeoMap:
         }).fillna(world['country'])
         return world
 
+    @classmethod
+    def _world_geometry_path(cls):
+        digest = hashlib.sha1(json.dumps(
+            [SnapshotStore.code_version, cls.simplify_tolerance, cls.quantization]).encode())
+        with open(cls.shapefile, 'rb') as f:
+            digest.update(f.read())
+        return os.path.join(cls.geometry_folder, f'world_{digest.hexdigest()[:16]}.npz')
+
+    @classmethod
+    def _quantized_ring(cls, ring):
+        ring_points = np.round(np.asarray(ring.coords)[:, :2] * cls.quantization).astype(np.int32)
+        # drop points that became repeated after quantization
+        return ring_points[np.r_[True, np.diff(ring_points, axis=0).any(axis=1)]]
+
+    @classmethod
+    def _build_world_geometry(cls, path):
+        """
+        Simplifies and quantizes the shapefile geometries, and stores them as arrays of
+        points with the end offsets of each ring, polygon (its rings) and country (its polygons).
+        """
+        world = cls.read_world_shapefile()
+        shapes = world['geometry'].simplify(cls.simplify_tolerance, preserve_topology=True)
+
+        points, ring_ends, polygon_ends, country_ends = [], [], [], []
+        n_points = 0
+        for shape in shapes:
+            for polygon in getattr(shape, 'geoms', [shape]):
+                rings = [cls._quantized_ring(ring) for ring in [polygon.exterior, *polygon.interiors]]
+                if len(rings[0]) < 4:  # exterior smaller than the quantization
+                    continue
+                for ring_points in rings:
+                    if len(ring_points) >= 4:
+                        points.append(ring_points)
+                        n_points += len(ring_points)
+                        ring_ends.append(n_points)
+                polygon_ends.append(len(ring_ends))
+            country_ends.append(len(polygon_ends))
+
+        os.makedirs(cls.geometry_folder, exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f,
+                                country=world['country'].values.astype(str),
+                                iso_code=world['iso_code'].values.astype(str),
+                                points=np.concatenate(points),
+                                ring_ends=np.array(ring_ends),
+                                polygon_ends=np.array(polygon_ends),
+                                country_ends=np.array(country_ends))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    @func_cache
+    def world_geometry(cls) -> pd.DataFrame:
+        """
+        :return: countries with simplified GeoJSON geometries (MultiPolygon dicts), built
+            from the shapefile once (needs geopandas), and loaded once per process
+        """
+        path = cls._world_geometry_path()
+        if not os.path.exists(path):
+            cls._build_world_geometry(path)
+        with np.load(path) as arrays:
+            points = (arrays['points'] / cls.quantization).tolist()
+            ring_ends, polygon_ends, country_ends = (
+                arrays['ring_ends'], arrays['polygon_ends'], arrays['country_ends'])
+            df = pd.DataFrame({'country': arrays['country'].astype(object),
+                               'iso_code': arrays['iso_code'].astype(object)})
+
+        rings = [points[start:end] for start, end in zip(np.r_[0, ring_ends[:-1]], ring_ends)]
+        polygons = [rings[start:end]
+                    for start, end in zip(np.r_[0, polygon_ends[:-1]], polygon_ends)]
+        df['geometry'] = [{'type': 'MultiPolygon', 'coordinates': polygons[start:end]}
+                          for start, end in zip(np.r_[0, country_ends[:-1]], country_ends)]
+        return df
+
+    @classmethod
+    def get_world_geo_df(cls):
+        return cls.world_geometry().copy()
+
+    @staticmethod
+    def geojson(geometries: pd.Series) -> dict:
+        """ :return: GeoJSON FeatureCollection of the geometries, with the index as ids """
+        return {'type': 'FeatureCollection',
+                'features': [{'type': 'Feature', 'id': str(i), 'properties': {}, 'geometry': g}
+                             for i, g in geometries.items()]}
+
     @classmethod
     def make_geo_df(cls, df_all, cases_filter=1000, deaths_filter=20):
         world = cls.get_world_geo_df()
@@ -1016,30 +2566,43 @@ class GeoMap:
                         hover_text_func=None,
                         scale_max=None,
                         colorscale='Bluered',
+                        hover: MapHover = None,
+                        hover_template=None,
                         ):
+        """
+        :param hover_text_func: function from a row to its hover text (html)
+        :param hover: numeric hover data, used instead of hover_text_func
+        :param hover_template: MapHover template of the hover text, the hover's default if None
+        """
         import plotly.graph_objects as go
 
-        # hover text
-        hover_text_func = hover_text_func if callable(hover_text_func) else lambda r: ''
-        df_plot_geo['text'] = df_plot_geo.apply(hover_text_func, axis=1)
-
         percent = ('rate' in col or 'ratio' in col)
 
+        if hover is not None:
+            hover_args = dict(customdata=hover.customdata,
+                              hovertemplate=hover.hovertemplate(percent, err_col, hover_template))
+        else:
+            # hover text
+            hover_text_func = hover_text_func if callable(hover_text_func) else lambda r: ''
+            df_plot_geo['text'] = df_plot_geo.apply(hover_text_func, axis=1)
+            hover_args = dict(
+                text=df_plot_geo['text'],
+                customdata=cls.error_series_to_string_list(
+                    series=df_plot_geo[col],
+                    err_series=df_plot_geo[err_col] if err_col else None,
+                    percent=percent
+                ),
+                hovertemplate="<b>%{id}</b>:<br><b>%{z:.1f}%{customdata}</b><br>%{text}<extra></extra>")
+
         fig = go.FigureWidget(
             data=go.Choropleth(
                 locations=df_plot_geo.index,
-                geojson=df_plot_geo['geometry'].__geo_interface__,
+                geojson=cls.geojson(df_plot_geo['geometry']),
                 z=df_plot_geo[col].fillna(float('nan')) * (100 if percent else 1),
                 zmin=0,
                 zmax=scale_max,
-                text=df_plot_geo['text'],
                 ids=df_plot_geo['country'],
-                customdata=cls.error_series_to_string_list(
-                    series=df_plot_geo[col],
-                    err_series=df_plot_geo[err_col] if err_col else None,
-                    percent=percent
-                ),
-                hovertemplate="<b>%{id}</b>:<br><b>%{z:.1f}%{customdata}</b><br>%{text}<extra></extra>",
+                **hover_args,
                 colorscale=colorscale,
                 colorbar={'title': {'text': f'<b>{colorbar_title}</b>'}},
                 autocolorscale=False,
@@ -1085,7 +2648,13 @@ class GeoMap:
     @classmethod
     def button_dict(cls, series, title, colorscale, scale_max=None,
                     percent=False, subtitle=None, err_series=None,
-                    hover_text_list=None, colorbar_title=None):
+                    hover_text_list=None, colorbar_title=None,
+                    hover: MapHover = None, hover_template=None):
+        """
+        :param hover: numeric hover data of the figure (as passed to make_map_figure), then
+            the error is referred to by err_series' name, and the hover text is
+            `hover_template` (the hover's default if None) instead of hover_text_list
+        """
         import plotly.express as px
 
         series = series.fillna(float('nan'))
@@ -1103,12 +2672,17 @@ class GeoMap:
             'zmax': [max_arg],
             'colorbar': [{'title': {'text': f'<b>{colorbar_title or title}</b>'}}],
             'colorscale': [scale_arg],
-            'customdata': [cls.error_series_to_string_list(
-                series, err_series=err_series, percent=percent)]
         }
 
-        if hover_text_list:
-            data_args_dict['text'] = [hover_text_list]
+        if hover is not None:
+            err_col = err_series.name if err_series is not None else None
+            data_args_dict['hovertemplate'] = [
+                hover.hovertemplate(percent, err_col, hover_template)]
+        else:
+            data_args_dict['customdata'] = [cls.error_series_to_string_list(
+                series, err_series=err_series, percent=percent)]
+            if hover_text_list:
+                data_args_dict['text'] = [hover_text_list]
 
         return dict(args=[data_args_dict,
                           {'title': {'text': f"<b>Map of</b>: {subtitle}",
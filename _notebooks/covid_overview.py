@@ -1,3 +1,9 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import numpy as np
 import pandas as pd
 
 
@@ -7,9 +13,33 @@ paths = {
     'overview': base_url + 'overview.tpl'
 }
 
+# downloads run in a thread pool, so that the ones that are started together are concurrent
+_pool = ThreadPoolExecutor(max_workers=4)
+_downloads = {}  # url -> future of the content, until it's read
+
+
+def fetch(url):
+    with urlopen(url) as response:
+        return response.read()
+
+
+def download(url):
+    """ starts downloading the url in the background, for a later read() """
+    if url not in _downloads:
+        _downloads[url] = _pool.submit(fetch, url)
+
+
+def read(path):
+    """ :return: content (bytes) of a url (of its started download if any) or a local file """
+    if bool(urlparse(path).netloc):
+        download(path)
+        return _downloads.pop(path).result()
+    with open(path, 'rb') as f:
+        return f.read()
+
 
 def get_mappings(url):
-    df = pd.read_csv(url, encoding='utf-8')
+    df = pd.read_csv(io.BytesIO(read(url)), encoding='utf-8')
     return {
         'df': df,
         'replace.country': dict(df.dropna(subset=['Name']).set_index('Country')['Name']),
@@ -17,27 +47,34 @@ def get_mappings(url):
     }
 
 
+# the template is needed by all the overview notebooks, it's downloaded with the mapping
+download(paths['overview'])
 mapping = get_mappings(paths['mapping'])
 
 
 def get_template(path):
-    from urllib.parse import urlparse
-    if bool(urlparse(path).netloc):
-        from urllib.request import urlopen
-        return urlopen(path).read().decode('utf8')
-    return open(path, encoding='utf8').read()
+    return read(path).decode('utf8')
 
 
-def get_frame(name):
-    url = (
+def frame_url(name):
+    return (
         'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/'
         f'csse_covid_19_time_series/time_series_covid19_{name}_global.csv')
-    df = pd.read_csv(url, encoding='utf-8')
+
+
+def get_frame(name):
+    df = pd.read_csv(io.BytesIO(read(frame_url(name))), encoding='utf-8')
     # rename countries
     df['Country/Region'] = df['Country/Region'].replace(mapping['replace.country'])
     return df
 
 
+def get_frames(names):
+    for name in names:  # downloads concurrently
+        download(frame_url(name))
+    return [get_frame(name) for name in names]
+
+
 def get_dates(df):
     dt_cols = df.columns[~df.columns.isin(['Province/State', 'Country/Region', 'Lat', 'Long'])]
     latest_date_idx = -1
@@ -49,19 +86,39 @@ def get_dates(df):
     return latest_date_idx, dt_cols
 
 
+def group_sum(df, col_region, cols):
+    """Same as df.groupby(col_region)[cols].sum() (nans are zeros), in a single np.add.reduceat
+
+    This module is fetched standalone by the overview notebooks, so this is a copy of
+    covid_helpers.RegionAggregation (__init__ and sum), keep the two in sync.
+    tests/test_region_aggregation.py checks both against groupby().sum()."""
+    codes, groups = pd.factorize(df[col_region], sort=True)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]  # rows without a region are dropped
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    values = df[cols].values[order]
+    if values.dtype.kind == 'f':  # reduceat would propagate nans
+        values = np.where(np.isnan(values), 0, values)
+    dtype = np.int64 if values.dtype.kind in 'iu' else None  # counts summed as int64
+    sums = np.add.reduceat(values, starts, axis=0, dtype=dtype) if len(order) else values
+    return pd.DataFrame(sums, index=pd.Index(groups, name=col_region), columns=cols)
+
+
 def gen_data(region='Country/Region', filter_frame=lambda x: x, add_table=[], kpis_info=[]):
     col_region = region
-    df = get_frame('confirmed')
+    df, df_deaths = get_frames(['confirmed', 'deaths'])
     dft_cases = df.pipe(filter_frame)
-    dft_deaths = get_frame('deaths').pipe(filter_frame)
+    dft_deaths = df_deaths.pipe(filter_frame)
     latest_date_idx, dt_cols = get_dates(df)
     dt_today = dt_cols[latest_date_idx]
     dt_5ago = dt_cols[latest_date_idx - 5]
 
-    dfc_cases = dft_cases.groupby(col_region)[dt_today].sum()
-    dfc_deaths = dft_deaths.groupby(col_region)[dt_today].sum()
-    dfp_cases = dft_cases.groupby(col_region)[dt_5ago].sum()
-    dfp_deaths = dft_deaths.groupby(col_region)[dt_5ago].sum()
+    # one rollup of each frame, all the needed columns are taken from it
+    dft_ct_cases = group_sum(dft_cases, col_region, dt_cols)
+    dft_ct_deaths = group_sum(dft_deaths, col_region, [dt_5ago, dt_today])
+    dfc_cases, dfp_cases = dft_ct_cases[dt_today], dft_ct_cases[dt_5ago]
+    dfc_deaths, dfp_deaths = dft_ct_deaths[dt_today], dft_ct_deaths[dt_5ago]
 
     df_table = (pd.DataFrame(dict(
         Cases=dfc_cases, Deaths=dfc_deaths,
@@ -85,7 +142,6 @@ def gen_data(region='Country/Region', filter_frame=lambda x: x, add_table=[], kp
         for x in kpis_info])
     summary = {'updated': pd.to_datetime(dt_today), 'since': pd.to_datetime(dt_5ago)}
     summary = {**summary, **df_table[metrics].sum(), **s_kpis}
-    dft_ct_cases = dft_cases.groupby(col_region)[dt_cols].sum()
     dft_ct_new_cases = dft_ct_cases.diff(axis=1).fillna(0).astype(int)
     return {
         'summary': summary, 'table': df_table, 'newcases': dft_ct_new_cases,
@@ -94,9 +150,9 @@ def gen_data(region='Country/Region', filter_frame=lambda x: x, add_table=[], kp
 
 def gen_data_us(region='Province/State', kpis_info=[]):
     col_region = region
-    df = pd.read_csv(
+    df = pd.read_csv(io.BytesIO(read(
         'https://raw.githubusercontent.com/nytimes/covid-19-data'
-        '/master/us-states.csv')
+        '/master/us-states.csv')))
     dt_today = df['date'].max()
     dt_5ago = (pd.to_datetime(dt_today) - pd.Timedelta(days=5)).strftime('%Y-%m-%d')
     cols = ['cases', 'deaths']
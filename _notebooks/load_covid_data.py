@@ -4,19 +4,18 @@ import numpy as np
 def load_individual_timeseries(name):
     base_url='https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series'
     url = f'{base_url}/time_series_covid19_{name}_global.csv'
-    df = pd.read_csv(url, 
-                     index_col=['Country/Region', 'Province/State', 'Lat', 'Long'])
-    df['type'] = name.lower()
-    df.columns.name = 'date'
-    
-    df = (df.set_index('type', append=True)
-            .reset_index(['Lat', 'Long'], drop=True)
-            .stack()
-            .reset_index()
-            .set_index('date')
-         )
-    df.index = pd.to_datetime(df.index)
-    df.columns = ['country', 'state', 'type', 'cases']
+    df = pd.read_csv(url)
+    dates = df.columns.drop(['Province/State', 'Country/Region', 'Lat', 'Long'])
+
+    # Long format (a row per location and date) built directly from the wide values
+    cases = df[dates].values.ravel()
+    df = pd.DataFrame({'country': np.repeat(df['Country/Region'].values, len(dates)),
+                       'state': np.repeat(df['Province/State'].values, len(dates)),
+                       'type': name.lower(),
+                       'cases': cases},
+                      index=pd.Index(np.tile(pd.to_datetime(dates), len(df)), name='date'))
+    if pd.isna(cases).any():
+        df = df.loc[~pd.isna(cases)]  # as in stacking, missing values are dropped
     
     # Move HK to country level
     df.loc[df.state =='Hong Kong', 'country'] = 'Hong Kong'
@@ -32,6 +31,19 @@ def load_individual_timeseries(name):
                    ])
     return df
 
+def days_since(df, n_cases=100):
+    """
+    Days relative to when `n_cases` confirmed cases were crossed, for each state of the
+    countries that have states and for each country without states (NaN for the country
+    level rows of countries that also have states).
+    """
+    has_states = df.state.notnull().groupby(df.country.values).transform('any').values
+    groups = df.groupby([df.country.values, df.state.fillna('').values], sort=False)
+    below = (df.confirmed < n_cases).groupby(groups.ngroup().values).transform('sum').values
+    days = (groups.cumcount().values - below).astype(float)
+    days[has_states & df.state.isnull().values] = np.nan
+    return days
+
 def load_data(drop_states=False, p_crit=.05, filter_n_days_100=None):
     df = load_individual_timeseries('confirmed')
     df = df.rename(columns={'cases': 'confirmed'})
@@ -43,17 +55,7 @@ def load_data(drop_states=False, p_crit=.05, filter_n_days_100=None):
     df = df.assign(critical_estimate=df.confirmed*p_crit)
 
     # Compute days relative to when 100 confirmed cases was crossed
-    df.loc[:, 'days_since_100'] = np.nan
-    for country in df.country.unique():
-        if not df.loc[(df.country == country), 'state'].isnull().all():
-            for state in df.loc[(df.country == country), 'state'].unique():
-                df.loc[(df.country == country) & (df.state == state), 'days_since_100'] = \
-                    np.arange(-len(df.loc[(df.country == country) & (df.state == state) & (df.confirmed < 100)]), 
-                              len(df.loc[(df.country == country) & (df.state == state) & (df.confirmed >= 100)]))
-        else:
-            df.loc[(df.country == country), 'days_since_100'] = \
-                np.arange(-len(df.loc[(df.country == country) & (df.confirmed < 100)]), 
-                          len(df.loc[(df.country == country) & (df.confirmed >= 100)]))
+    df.loc[:, 'days_since_100'] = days_since(df, n_cases=100)
 
     # Add recovered cases
 #     df_recovered = load_individual_timeseries('Recovered')
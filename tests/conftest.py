@@ -0,0 +1,165 @@
+import hashlib
+import http.server
+import importlib
+import io
+import os
+import socket
+import sys
+import threading
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# covid_helpers (and the benchmark's synthetic data) are modules of the notebooks folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), '_notebooks'))
+
+import covid_helpers  # noqa: E402
+from benchmark_covid_helpers import synthetic_jhu_frames  # noqa: E402
+
+
+@pytest.fixture
+def jhu_frames():
+    """ small synthetic raw JHU confirmed and deaths dataframes """
+    dft_cases, dft_deaths = synthetic_jhu_frames(n_regions=40, n_dates=150, seed=1)
+    return {'confirmed': dft_cases, 'deaths': dft_deaths}
+
+
+@pytest.fixture
+def covid_data(jhu_frames, tmp_path, monkeypatch):
+    """ CovidData class loaded with the synthetic frames, storing its state in tmp_path """
+    monkeypatch.setattr(covid_helpers.CovidData, 'state_folder', str(tmp_path / 'covid_state'))
+    return covid_helpers.CovidData.load(jhu_frames)
+
+
+@pytest.fixture
+def set_owid(covid_data, monkeypatch):
+    """
+    :return: function that sets the OWID data of the covid_data regions (instead of
+        downloading it), to the ICU beds per million, and 50% vaccinated
+    """
+    owid = covid_helpers.OWID
+
+    def set_owid(icu_per_mil):
+        regions = covid_data().cases.regions
+        df = pd.DataFrame({owid.icu_per_mil_col: icu_per_mil,
+                           owid.vaccination_percent_col: np.full(len(regions), 50.0)},
+                          index=pd.Index(regions, name=covid_helpers.COL_REGION))
+        monkeypatch.setattr(owid, 'latest_snapshot', classmethod(lambda cls: df))
+    return set_owid
+
+
+@pytest.fixture
+def covid_overview(monkeypatch):
+    """
+    covid_overview module imported again, with urlopen serving `covid_overview.sources`
+    (url -> bytes, or callable returning them), initially the mapping from the local
+    copy and an empty template. The requested urls are in `covid_overview.requested`.
+    """
+    sources = {'mapping_countries.csv': lambda: open(
+        os.path.join(covid_helpers.data_folder, 'mapping_countries.csv'), 'rb').read(),
+        'overview.tpl': b''}
+    requested = []
+
+    def urlopen(url):
+        requested.append(url)
+        for name, content in sources.items():
+            if url.endswith(name):
+                return io.BytesIO(content() if callable(content) else content)
+        raise covid_helpers.URLError(f'not a stand-in source: {url}')
+
+    monkeypatch.setattr(urllib.request, 'urlopen', urlopen)
+    monkeypatch.delitem(sys.modules, 'covid_overview', raising=False)
+    module = importlib.import_module('covid_overview')
+    module.sources, module.requested = sources, requested
+    return module
+
+
+class SourceHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves `server.files` (path -> bytes) with an ETag, and 304 for conditional requests.
+    `server.redirects` (path -> location) are redirected, and `server.failures`
+    (path -> number) fail with 503 that number of times. Also acts as a proxy for
+    absolute url paths, and refuses CONNECT tunnels.
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def record(self):
+        self.server.requests.append({'method': self.command, 'path': self.path,
+                                     'headers': dict(self.headers),
+                                     'client': self.client_address})
+
+    def do_GET(self):
+        self.record()
+        if self.path in self.server.redirects:
+            self.send_response(302)
+            self.send_header('Location', self.server.redirects[self.path])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.server.failures.get(self.path):
+            self.server.failures[self.path] -= 1
+            self.send_error(503)
+            return
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Wed, 02 Jun 2021 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_CONNECT(self):
+        self.record()
+        self.send_error(403)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    Local HTTP server standing in for the external sources (see SourceHandler), with
+    the received `requests`, and its `url`
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SourceHandler)
+    server.files, server.redirects, server.failures, server.requests = {}, {}, {}, []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def unreachable_url():
+    """ url of a local port that nothing listens on """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+@pytest.fixture(autouse=True)
+def fresh_fetcher(monkeypatch):
+    """
+    no prefetched responses are shared between tests, and no proxies are used unless
+    a test sets them
+    """
+    monkeypatch.setattr(covid_helpers.Fetcher, '_responses', {})
+    monkeypatch.setattr(covid_helpers.Fetcher, 'retry_backoff_seconds', 0)
+    for name in ['http_proxy', 'https_proxy', 'no_proxy', 'all_proxy']:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from covid_helpers import COL_REGION
+
+
+def backfill_missing_loop(series, backfill_prev_threshold=50):
+    """ the original (per region) implementation of CovidData.backfill_missing() """
+    out = [series[0]]
+    missing = 0
+    for cur in series[1:]:
+        if cur == 0:
+            if out[-1] >= backfill_prev_threshold:
+                missing += 1
+            else:
+                out.append(cur)
+        elif cur > 0:
+            if missing:
+                out.extend([cur / (missing + 1)] * (missing + 1))
+                missing = 0
+            else:
+                out.append(cur)
+        else:
+            if missing:
+                out.extend([0] * missing)
+                missing = 0
+            out.append(cur)
+
+    if missing:
+        out.extend([0] * missing)
+
+    return pd.Series(out, index=series.index)
+
+
+def test_backfill_missing_matches_loop(covid_data):
+    cases = covid_data.dft_cases_raw.groupby(COL_REGION)[covid_data.dt_cols_all].sum()
+    diffs = cases.diff(axis=1)
+    diffs.iloc[:, 0] = cases.iloc[:, 0]
+
+    for threshold in [0, 10, 50]:
+        expected = diffs.apply(backfill_missing_loop, axis=1,
+                               backfill_prev_threshold=threshold).values
+        np.testing.assert_array_equal(covid_data.backfill_missing(diffs.values, threshold),
+                                      expected)
+
+
+def test_backfilled_cases_match_loop(covid_data):
+    cases = covid_data.dft_cases_raw.groupby(COL_REGION)[covid_data.dt_cols_all].sum()
+    diffs = cases.diff(axis=1)
+    diffs.iloc[:, 0] = cases.iloc[:, 0]
+    expected = diffs.apply(backfill_missing_loop, axis=1).cumsum(axis=1)
+
+    pd.testing.assert_frame_equal(covid_data()._cases_with_backfilled_unreported_days(),
+                                  expected, check_dtype=False, check_names=False)
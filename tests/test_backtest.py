@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import Backtest
+
+PROJECTION_DAYS = (2, 3)
+
+
+@pytest.fixture
+def data(covid_data, set_owid):
+    set_owid(np.full(len(covid_data().cases.regions), 100.0))
+    return covid_data
+
+
+def test_serial_keeps_the_loaded_data(data):
+    cases_raw, cases = data.dft_cases_raw, data().cases.values.copy()
+
+    Backtest.run(n_offsets=2, projection_days=PROJECTION_DAYS, max_workers=0)
+
+    assert data.dft_cases_raw is cases_raw
+    np.testing.assert_array_equal(data().cases.values, cases)
+
+
+def test_serial_and_pool_results_equal(data):
+    serial = Backtest.run(n_offsets=3, projection_days=PROJECTION_DAYS, max_workers=0)
+    pool = Backtest.run(n_offsets=3, projection_days=PROJECTION_DAYS, max_workers=2)
+
+    assert len(serial) and set(serial['days_offset']) == {-1, -2, -3}
+    pd.testing.assert_frame_equal(pool, serial)
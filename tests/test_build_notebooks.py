@@ -0,0 +1,40 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ACTION_FILES = os.path.join(os.path.dirname(os.path.dirname(__file__)), '_action_files')
+
+
+@pytest.fixture
+def build_notebooks(monkeypatch):
+    """ build_notebooks module, with the precomputing functions recording their calls """
+    monkeypatch.syspath_prepend(ACTION_FILES)
+    monkeypatch.setenv('COVID_HELPERS_SNAPSHOTS', '0')  # restored after the import sets it
+    module = importlib.import_module('build_notebooks')
+    module.calls = []
+    monkeypatch.setattr(module, 'PIPELINE_TABLES', {
+        name: (lambda name=name: module.calls.append(name)) for name in module.PIPELINE_TABLES})
+    return module
+
+
+def test_pipeline_only_for_executed_notebooks(build_notebooks):
+    notebooks = build_notebooks.notebooks_to_execute()
+    assert not any(path.stem in build_notebooks.PIPELINE_TABLES for path in notebooks)
+    assert build_notebooks.run_pipeline(notebooks) == []
+    assert build_notebooks.calls == []
+
+
+def test_pipeline_for_py_notebooks(build_notebooks):
+    folder = build_notebooks.NOTEBOOKS_DIR
+    notebooks = [folder / '2020-03-21-covid19-overview.ipynb',
+                 folder / '2020-12-19-covid19-micromorts.ipynb']
+    assert build_notebooks.run_pipeline(notebooks) == ['2020-12-19-covid19-micromorts']
+    assert build_notebooks.calls == ['2020-12-19-covid19-micromorts']
+    assert sys.path[0] != str(folder)
+
+
+def test_pipeline_tables_are_of_existing_notebooks(build_notebooks):
+    for name in build_notebooks.PIPELINE_TABLES:
+        assert (build_notebooks.NOTEBOOKS_DIR / f'{name}.py').exists()
@@ -0,0 +1,46 @@
+import threading
+
+import pandas as pd
+
+
+def test_import_downloads_mapping_and_template(covid_overview):
+    assert sorted(covid_overview.requested) == sorted(covid_overview.paths.values())
+    assert 'Europe' in covid_overview.mapping['map.continent'].values()
+
+    covid_overview.sources['overview.tpl'] = b'<table>'
+    assert covid_overview.get_template(covid_overview.paths['overview']) == ''  # downloaded
+    assert covid_overview.get_template(covid_overview.paths['overview']) == '<table>'
+
+
+def test_frames_downloaded_concurrently(covid_overview, jhu_frames):
+    # each download waits for the other one to start, so it times out if they're serial
+    started = threading.Barrier(2, timeout=5)
+
+    def frame_source(name):
+        def content():
+            started.wait()
+            return jhu_frames[name].to_csv(index=False).encode()
+        return content
+
+    for name in ['confirmed', 'deaths']:
+        covid_overview.sources[f'{name}_global.csv'] = frame_source(name)
+
+    df, df_deaths = covid_overview.get_frames(['confirmed', 'deaths'])
+
+    assert df.shape == jhu_frames['confirmed'].shape
+    assert df_deaths.shape == jhu_frames['deaths'].shape
+
+
+def test_gen_data_us(covid_overview):
+    dates = pd.date_range('2021-01-01', periods=10).strftime('%Y-%m-%d')
+    df = pd.DataFrame({'date': list(dates) * 2, 'state': ['A'] * 10 + ['B'] * 10,
+                       'cases': list(range(10)) + list(range(0, 20, 2)),
+                       'deaths': [0] * 20})
+    covid_overview.sources['us-states.csv'] = df.to_csv(index=False).encode()
+
+    data = covid_overview.gen_data_us(kpis_info=[{'title': 'A', 'prefix': 'A'}])
+
+    assert data['summary']['Cases'] == 9 + 18
+    assert data['summary']['Cases (+)'] == 5 + 10
+    assert data['summary']['A Cases'] == 9
+    assert (data['newcases'].loc['B'].iloc[1:] == 2).all()
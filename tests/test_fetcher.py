@@ -0,0 +1,92 @@
+import pytest
+
+import covid_helpers
+from covid_helpers import Fetcher, HTTPError, URLError
+
+
+@pytest.fixture
+def server(http_server):
+    http_server.files['/a.csv'] = b'a,b\n1,2\n'
+    http_server.files['/b.csv'] = b'a,b\n3,4\n'
+    return http_server
+
+
+def test_get(server):
+    assert Fetcher.get(server.url + '/a.csv') == b'a,b\n1,2\n'
+    assert Fetcher.get(server.url + '/b.csv') == b'a,b\n3,4\n'
+    assert server.requests[-1]['headers']['User-Agent'] == 'covid19-dashboard'
+
+
+def test_redirect(server):
+    server.redirects['/old.csv'] = '/a.csv'
+
+    assert Fetcher.get(server.url + '/old.csv') == b'a,b\n1,2\n'
+
+
+def test_retries_server_errors(server):
+    server.failures['/a.csv'] = 2
+
+    assert Fetcher.get(server.url + '/a.csv') == b'a,b\n1,2\n'
+    assert len(server.requests) == 3
+
+
+def test_raises_http_errors(server, monkeypatch):
+    monkeypatch.setattr(Fetcher, 'retries', 0)
+
+    with pytest.raises(HTTPError) as error:
+        Fetcher.get(server.url + '/missing.csv')
+    assert error.value.code == 404
+
+
+def test_prefetch(server):
+    urls = [server.url + '/a.csv', (server.url + '/b.csv', {'If-None-Match': '"x"'}),
+            server.url + '/missing.csv']
+    Fetcher.prefetch(urls)
+    n_requests = len(server.requests)
+
+    assert Fetcher.get(server.url + '/a.csv') == b'a,b\n1,2\n'
+    assert Fetcher.request(server.url + '/b.csv', {'If-None-Match': '"x"'})[0] == b'a,b\n3,4\n'
+    with pytest.raises(HTTPError):
+        Fetcher.get(server.url + '/missing.csv')
+    assert len(server.requests) == n_requests  # served from the prefetched responses
+
+
+def test_http_proxy(server, monkeypatch):
+    server.files['http://source.invalid/a.csv'] = b'proxied'
+    monkeypatch.setenv('HTTP_PROXY', server.url.replace('127.0.0.1', 'user:pass@127.0.0.1'))
+
+    assert Fetcher.get('http://source.invalid/a.csv') == b'proxied'
+    request = server.requests[-1]
+    assert request['path'] == 'http://source.invalid/a.csv'
+    assert request['headers']['Host'] == 'source.invalid'
+    assert request['headers']['Proxy-Authorization'] == 'Basic dXNlcjpwYXNz'
+
+
+def test_https_proxy_tunnel(server, monkeypatch):
+    monkeypatch.setenv('HTTPS_PROXY', server.url)
+    monkeypatch.setattr(Fetcher, 'retries', 0)
+
+    with pytest.raises(URLError):  # the stand-in proxy refuses the tunnel
+        Fetcher.get('https://source.invalid/a.csv')
+    assert server.requests[-1]['method'] == 'CONNECT'
+    assert server.requests[-1]['path'] == 'source.invalid:443'
+
+
+def test_no_proxy(server, unreachable_url, monkeypatch):
+    monkeypatch.setenv('HTTP_PROXY', unreachable_url)
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+
+    assert Fetcher.get(server.url + '/a.csv') == b'a,b\n1,2\n'
+
+
+def test_jhu_download_through_proxy(server, jhu_frames, tmp_path, monkeypatch):
+    server.files['http://jhu.invalid/deaths.csv'] = jhu_frames['deaths'].to_csv(
+        index=False).encode()
+    monkeypatch.setenv('HTTP_PROXY', server.url)
+    monkeypatch.setattr(covid_helpers, 'data_folder', str(tmp_path))
+    monkeypatch.setattr(covid_helpers, 'OFFLINE', False)
+    monkeypatch.setattr(covid_helpers.SourceData, 'jhu_url', 'http://jhu.invalid/{name}.csv')
+
+    df = covid_helpers.SourceData._download_covid_df('deaths')
+
+    assert df.shape == jhu_frames['deaths'].shape
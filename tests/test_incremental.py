@@ -0,0 +1,121 @@
+import inspect
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import CovidData, SnapshotStore, SourceData
+
+MIN_WINDOW_LAG, MIN_WINDOW_DEATHS = 20, 100  # so that the small frames have windows
+
+
+def first_dates(frames, n_dates):
+    return {name: df[list(df.columns[:4]) + list(SourceData.get_dates(df)[:n_dates])]
+            for name, df in frames.items()}
+
+
+def scans(frames, incremental):
+    """ :return: backfilled cases and testing bias windows ratios and found, as arrays """
+    CovidData.incremental = incremental
+    data = CovidData.load(frames)()
+    ratios, found = data._full_history_testing_bias_windows(MIN_WINDOW_LAG, MIN_WINDOW_DEATHS)
+    return [data._cases_with_backfilled_unreported_days().values, ratios.values, found.values]
+
+
+@pytest.fixture
+def resumed(covid_data, monkeypatch):
+    """ list of whether each scan was resumed from a stored state """
+    resumed = []
+    for name in ['backfill_scan', 'testing_bias_window_starts']:
+        scan = getattr(CovidData, name)
+
+        def recording(*args, scan=scan, **kwargs):
+            state = inspect.signature(scan).bind(*args, **kwargs).arguments.get('state')
+            resumed.append(state is not None)
+            return scan(*args, **kwargs)
+        monkeypatch.setattr(CovidData, name, staticmethod(recording))
+    monkeypatch.setattr(CovidData, 'incremental', False)
+    return resumed
+
+
+def assert_scans_equal(actual, expected):
+    for actual_values, expected_values in zip(actual, expected):
+        np.testing.assert_array_equal(actual_values, expected_values)
+
+
+def test_resumed_scans_equal_full_scans(jhu_frames, resumed):
+    scans(first_dates(jhu_frames, 130), incremental=True)
+    resumed.clear()
+
+    incremental = scans(jhu_frames, incremental=True)
+
+    assert resumed == [True, True, True]  # backfill, windows, backfill again
+    assert_scans_equal(incremental, scans(jhu_frames, incremental=False))
+
+
+def test_revised_past_data_is_scanned_again(jhu_frames, resumed):
+    scans(first_dates(jhu_frames, 130), incremental=True)
+    for df in jhu_frames.values():
+        df.iloc[:, 50:] += np.arange(len(df))[:, None] % 3 * 5  # revised from date 46
+    resumed.clear()
+
+    incremental = scans(jhu_frames, incremental=True)
+
+    assert resumed[:2] == [False, False]
+    assert_scans_equal(incremental, scans(jhu_frames, incremental=False))
+
+
+def test_repeated_run_equals_full_scans(jhu_frames, resumed):
+    scans(jhu_frames, incremental=True)
+
+    incremental = scans(jhu_frames, incremental=True)
+
+    assert_scans_equal(incremental, scans(jhu_frames, incremental=False))
+
+
+def test_state_of_other_code_version_is_not_resumed(jhu_frames, resumed, monkeypatch):
+    scans(first_dates(jhu_frames, 130), incremental=True)
+    monkeypatch.setattr(SnapshotStore, 'code_version', 'changed')
+    resumed.clear()
+
+    incremental = scans(jhu_frames, incremental=True)
+
+    assert resumed[:2] == [False, False]
+    assert_scans_equal(incremental, scans(jhu_frames, incremental=False))
+    # the states of the previous code version are removed
+    assert all(name.endswith('_changed.pkl') for name in os.listdir(CovidData.state_folder))
+
+
+@pytest.fixture
+def recovery_prefixes(monkeypatch):
+    """ list of the number of dates that each recovered_history() call continued from """
+    prefixes = []
+    recovered_history = CovidData.recovered_history
+
+    def recording(cases, recs_prefix=None):
+        prefixes.append(0 if recs_prefix is None else len(recs_prefix))
+        return recovered_history(cases, recs_prefix)
+    monkeypatch.setattr(CovidData, 'recovered_history', staticmethod(recording))
+    return prefixes
+
+
+def recovery(frames, incremental):
+    """ :return: active and recovered ratios dataframes """
+    CovidData.incremental = incremental
+    data = CovidData.load(frames)()
+    _, past_active, past_recovered = data.table_with_current_rates_and_ratios()
+    return past_active, past_recovered
+
+
+def test_resumed_recovery_history_equals_full(jhu_frames, resumed, set_owid,
+                                              recovery_prefixes):
+    set_owid(np.full(len(CovidData().cases.regions), 100.0))
+    recovery(first_dates(jhu_frames, 130), incremental=True)
+    recovery_prefixes.clear()
+
+    incremental = recovery(jhu_frames, incremental=True)
+
+    assert 130 in recovery_prefixes  # continued from the stored history
+    for actual, expected in zip(incremental, recovery(jhu_frames, incremental=False)):
+        pd.testing.assert_frame_equal(actual, expected)
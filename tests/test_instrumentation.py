@@ -0,0 +1,37 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from covid_helpers import Instrumentation
+
+
+@pytest.fixture(params=['reset_peak', 'restart'])
+def peak_reset(request, monkeypatch):
+    """ both ways of resetting the peak: tracemalloc.reset_peak, and restarting the tracing
+    (python < 3.9, that doesn't have reset_peak) """
+    if request.param == 'restart':
+        monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    return request.param
+
+
+def test_stage_memory(peak_reset):
+    mb = 2 ** 20
+    with Instrumentation.recording():
+        before = np.ones(20 * mb // 8)  # traced before the stages, and freed in them
+        with Instrumentation.stage('outer'):
+            with Instrumentation.stage('temporary'):
+                temporary = np.ones(10 * mb // 8)
+                del temporary
+            with Instrumentation.stage('kept'):
+                kept = np.ones(5 * mb // 8)
+            del before
+    records = Instrumentation.report().set_index('stage')
+
+    assert records.loc['temporary', 'peak_mb'] == pytest.approx(10, abs=0.5)
+    assert records.loc['temporary', 'allocated_mb'] == pytest.approx(0, abs=0.5)
+    assert records.loc['kept', 'peak_mb'] == pytest.approx(5, abs=0.5)
+    assert records.loc['kept', 'allocated_mb'] == pytest.approx(5, abs=0.5)
+    # the inner stages' peaks count in the outer stage's peak
+    assert records.loc['outer', 'peak_mb'] == pytest.approx(10, abs=0.5)
+    assert kept.size
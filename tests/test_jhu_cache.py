@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import covid_helpers
+from covid_helpers import SourceData
+
+
+@pytest.fixture
+def jhu_source(http_server, jhu_frames, tmp_path, monkeypatch):
+    """ SourceData downloading from the local server, with its cache in tmp_path """
+    for name, df in jhu_frames.items():
+        http_server.files[f'/{name}.csv'] = df.to_csv(index=False).encode()
+    monkeypatch.setattr(covid_helpers, 'data_folder', str(tmp_path))
+    monkeypatch.setattr(covid_helpers, 'OFFLINE', False)
+    monkeypatch.setattr(covid_helpers, 'JHU_CACHE_MAX_AGE_SECONDS', 0)  # always revalidate
+    monkeypatch.setattr(SourceData, 'jhu_url', http_server.url + '/{name}.csv')
+    return http_server
+
+
+def test_download_and_cache(jhu_source, jhu_frames):
+    df = SourceData._download_covid_df('confirmed')
+
+    pd.testing.assert_frame_equal(df, jhu_frames['confirmed'], check_dtype=False)
+    meta = SourceData._read_cache_meta('confirmed')
+    assert meta['etag'] and meta['last_modified']
+    assert 'If-None-Match' not in jhu_source.requests[-1]['headers']
+
+
+def test_not_modified_uses_cache(jhu_source, jhu_frames):
+    first = SourceData._download_covid_df('confirmed')
+    checked_at = SourceData._read_cache_meta('confirmed')['checked_at']
+
+    df = SourceData._download_covid_df('confirmed')
+
+    pd.testing.assert_frame_equal(df, first)
+    headers = jhu_source.requests[-1]['headers']
+    assert headers['If-None-Match'] == SourceData._read_cache_meta('confirmed')['etag']
+    assert headers['If-Modified-Since'] == 'Wed, 02 Jun 2021 00:00:00 GMT'
+    assert SourceData._read_cache_meta('confirmed')['checked_at'] > checked_at
+
+
+def test_modified_is_downloaded_again(jhu_source, jhu_frames):
+    SourceData._download_covid_df('confirmed')
+    updated = jhu_frames['confirmed'].copy()
+    updated[updated.columns[-1]] += 1
+    jhu_source.files['/confirmed.csv'] = updated.to_csv(index=False).encode()
+
+    df = SourceData._download_covid_df('confirmed')
+
+    pd.testing.assert_frame_equal(df, updated, check_dtype=False)
+    pd.testing.assert_frame_equal(pd.read_pickle(SourceData._cache_raw_paths('confirmed')[0]), df)
+
+
+def test_unreachable_falls_back_to_cache(jhu_source, unreachable_url, monkeypatch):
+    cached = SourceData._download_covid_df('confirmed')
+    monkeypatch.setattr(SourceData, 'jhu_url', unreachable_url + '/{name}.csv')
+    # the cache is of the same source url
+    meta = SourceData._read_cache_meta('confirmed')
+    SourceData._write_cache('confirmed', {**meta, 'url': SourceData.jhu_url.format(name='confirmed')})
+
+    with pytest.warns(UserWarning, match='stale cached JHU data'):
+        df = SourceData._download_covid_df('confirmed')
+
+    pd.testing.assert_frame_equal(df, cached)
+
+
+def test_unreachable_without_cache_raises(jhu_source, unreachable_url, monkeypatch):
+    monkeypatch.setattr(SourceData, 'jhu_url', unreachable_url + '/{name}.csv')
+    monkeypatch.setattr(covid_helpers.Fetcher, 'retries', 0)
+
+    with pytest.raises(covid_helpers.URLError):
+        SourceData._download_covid_df('confirmed')
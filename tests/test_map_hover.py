@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from covid_helpers import MapHover
+
+
+@pytest.fixture
+def hover():
+    df = pd.DataFrame({'Cases.total': [1., 2.], 'transmission_rate': [.1, .2]})
+    return MapHover(df, columns=['Cases.total', 'transmission_rate'])
+
+
+def test_placeholders_are_column_references(hover):
+    assert (hover.template('Cases: {Cases.total:,.0f}, rate: {transmission_rate}') ==
+            'Cases: %{customdata[0]:,.0f}, rate: %{customdata[1]}')
+
+
+def test_escaped_braces_are_literal(hover):
+    label = MapHover.escape('{transmission_rate} {x:y} }{')
+    assert hover.template(f'{label}: {{Cases.total}}') == '{transmission_rate} {x:y} }{: %{customdata[0]}'
+
+
+def test_literal_percent_brace_is_not_a_plotly_variable(hover):
+    label = MapHover.escape('100%{z}')
+    assert hover.template(f'{label} {{transmission_rate:.1%}}') == '100&#37;{z} %{customdata[1]:.1%}'
+    # also when the brace is an escaped one
+    assert hover.template('5%{{') == '5&#37;{'
+    # a literal '%' before a placeholder is still just a '%'
+    assert hover.template('5%{Cases.total}') == '5%%{customdata[0]}'
+
+
+def test_single_brace_is_an_error(hover):
+    with pytest.raises(ValueError):
+        hover.template('a { b')
+    with pytest.raises(ValueError):
+        hover.template('a } b')
+
+
+def test_hovertemplate_wraps_the_text(hover):
+    assert hover.hovertemplate(percent=True, err_col='transmission_rate',
+                               template=MapHover.escape('{a}')) == (
+        '<b>%{id}</b>:<br><b>%{z:.1f}% ± %{customdata[1]:.1%}</b><br>{a}<extra></extra>')
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import Model
+
+PROJECTION_DAYS = (7, 14, 30)
+
+
+@pytest.fixture
+def projections(covid_data, set_owid):
+    """ table with the projected columns, traces, and the number of past days """
+    set_owid(np.full(len(covid_data().cases.regions), 100.0))
+    df, past_active, past_recovered = covid_data().table_with_current_rates_and_ratios()
+    df, traces = Model.run_model_forward(df, past_active=past_active.copy(),
+                                         past_recovered=past_recovered.copy(),
+                                         projection_days=PROJECTION_DAYS)
+    return df, traces, past_recovered.shape[1]
+
+
+def test_traces_are_countries_by_days_frames(projections):
+    df, traces, n_past = projections
+    assert set(traces) == set(Model.trace_columns.values())
+    for trace in traces.values():
+        assert isinstance(trace, pd.DataFrame)
+        assert trace.shape == (len(traces['rec_center']), n_past + PROJECTION_DAYS[-1])
+        pd.testing.assert_index_equal(trace.index, traces['rec_center'].index)
+    assert set(traces['rec_center'].index) >= set(df.index)
+    # the envelopes contain the center (of the countries with data)
+    known = traces['act_center'].notna()
+    assert (traces['act_min'] <= traces['act_center'])[known].values.all()
+    assert (traces['act_center'] <= traces['act_max'])[known].values.all()
+
+
+def test_projected_columns_are_of_the_traces(projections):
+    df, traces, n_past = projections
+    for day in PROJECTION_DAYS:
+        ind = n_past + day - 1
+        np.testing.assert_array_equal(
+            df[f'affected_ratio.est.+{day}d'],
+            1 - traces['sus_center'][ind].reindex(df.index))
+        np.testing.assert_allclose(
+            df[f'needICU.per100k.+{day}d.max'],
+            traces['act_max'][ind].reindex(df.index) * df['age_adjusted_icu_percentage'] * 1e5)
+
+
+def test_traces_long_frame(projections):
+    df, traces, n_past = projections
+    countries = list(df.index[[5, 2, 7]])
+    long = Model.traces_long_frame(traces, simulation_start_day=n_past - 1,
+                                   infection_rate=df['transmission_rate'],
+                                   countries=countries, days=(-3, 10))
+
+    days = np.arange(-3, 11)
+    assert list(long['country']) == [c for c in countries for _ in days]
+    assert list(long['day']) == list(days) * len(countries)
+    for col, name in Model.trace_columns.items():
+        expected = traces[name].loc[countries, days + n_past - 1]
+        np.testing.assert_array_equal(long[col], expected.values.ravel())
+    rate = df.loc[countries[0], 'transmission_rate']
+    assert long['title'].iloc[0].startswith(f'{countries[0]}: Transmission Rate: {rate:.1%}.')
+
+
+def test_timeseries_for_countries(projections):
+    df, traces, n_past = projections
+    frames = Model.timeseries_for_countries(df.index[:3], traces,
+                                            simulation_start_day=n_past - 1,
+                                            infection_rate=df['transmission_rate'])
+    days = np.arange(traces['rec_center'].shape[1]) - (n_past - 1)
+    assert len(frames) == 3
+    for country, frame in zip(df.index[:3], frames):
+        assert (frame['country'] == country).all()
+        assert list(frame.index) == list(days)
+        np.testing.assert_array_equal(frame['Infected'], traces['act_center'].loc[country])
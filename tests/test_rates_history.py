@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def data(covid_data, set_owid):
+    """ CovidData instance with the estimated cases calculated """
+    set_owid(np.full(len(covid_data().cases.regions), 100.0))
+    data = covid_data()
+    data.table_with_estimated_cases()
+    return data
+
+
+@pytest.mark.parametrize('n_days', [1, 5, 7, 14, 30])
+def test_growth_rates_history_matches_each_date(data, n_days):
+    growth, growth_std = data.smoothed_growth_rates_history(n_days)
+    cases_est = data.cases_est
+    assert growth.shape == growth_std.shape == cases_est.shape
+
+    for date in sorted({0, max(n_days - 2, 0), n_days - 1, 60, cases_est.shape[1] - 1}):
+        # the rates calculated on the data until that date
+        data.cases_est = cases_est.first_dates(date + 1)
+        expected, expected_std = data.smoothed_growth_rates(n_days)
+        if n_days < 8:  # bit for bit, as in the table (PREV_LAG days)
+            np.testing.assert_array_equal(growth.iloc[:, date], expected)
+            np.testing.assert_array_equal(growth_std.iloc[:, date], expected_std)
+        else:  # numpy sums 8 or more values pairwise, in another order than the windows
+            np.testing.assert_allclose(growth.iloc[:, date], expected, rtol=1e-12, atol=1e-15)
+            np.testing.assert_allclose(growth_std.iloc[:, date], expected_std,
+                                       rtol=1e-12, atol=1e-15)
+
+
+def test_transmission_rates_history_last_date_matches_table(data):
+    rates, rates_std = data.transmission_rates_history()
+    df, past_active, _ = data.table_with_current_rates_and_ratios()
+    assert rates.shape == past_active.shape
+
+    known = df.index[past_active.iloc[:, -1].reindex(df.index).notna()]
+    assert len(known)
+    pd.testing.assert_series_equal(rates.iloc[:, -1].reindex(known),
+                                   df.loc[known, 'transmission_rate'], check_names=False)
+    pd.testing.assert_series_equal(rates_std.iloc[:, -1].reindex(known),
+                                   df.loc[known, 'transmission_rate_std'], check_names=False)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import COL_REGION, RegionAggregation
+
+
+@pytest.fixture
+def df():
+    """ rows with missing values (a group with one, and an all missing group), and a row
+    without a region """
+    return pd.DataFrame({COL_REGION: ['B', 'A', 'B', None, 'C', 'A', 'C'],
+                         '1/22/20': [1.0, 2.0, np.nan, 5.0, np.nan, 3.0, np.nan],
+                         '1/23/20': [4.0, np.nan, 6.0, 1.0, np.nan, 1.0, np.nan]})
+
+
+def test_sum_with_missing_values(df):
+    cols = ['1/22/20', '1/23/20']
+    aggregation = RegionAggregation(df[COL_REGION], name=COL_REGION)
+
+    pd.testing.assert_frame_equal(aggregation.sum_frame(df, cols),
+                                  df.groupby(COL_REGION)[cols].sum())
+    np.testing.assert_array_equal(aggregation.sum(df[cols].values)[0], [5, 1])  # A
+
+
+def test_sum_of_counts_is_int64():
+    aggregation = RegionAggregation(['A', 'A'])
+    values = np.full((2, 1), np.iinfo(np.int32).max, dtype=np.int32)
+
+    assert aggregation.sum(values)[0, 0] == 2 * int(np.iinfo(np.int32).max)
+
+
+def test_group_sum_with_missing_values(df, covid_overview):
+    cols = ['1/22/20', '1/23/20']
+
+    pd.testing.assert_frame_equal(covid_overview.group_sum(df, COL_REGION, cols),
+                                  df.groupby(COL_REGION)[cols].sum())
+
+
+@pytest.mark.parametrize('dtype', [np.int32, np.float64])
+def test_group_sum_same_as_region_aggregation(jhu_frames, covid_overview, dtype):
+    df = jhu_frames['confirmed']
+    cols = list(df.columns[4:])
+    df = df.astype({col: dtype for col in cols})
+    aggregation = RegionAggregation(df[COL_REGION], name=COL_REGION)
+
+    expected = aggregation.sum_frame(df, cols)
+    actual = covid_overview.group_sum(df, COL_REGION, cols)
+    pd.testing.assert_frame_equal(actual, expected)
+    assert actual.values.dtype == (np.int64 if dtype == np.int32 else np.float64)
@@ -0,0 +1,29 @@
+import numpy as np
+
+OFFSETS = [0, -1, -30]
+
+
+def test_offsets_share_the_history_matrices(covid_data):
+    instances = [covid_data(offset) for offset in OFFSETS]
+    full = covid_data(0)
+    for data in instances:
+        # the backfilled cases keep fractional cases, so they stay float64
+        assert data.cases.values.dtype == np.float64
+        assert data.deaths.values.dtype == np.int32
+        for name in ['cases', 'deaths']:
+            values = getattr(data, name).values
+            assert values.shape[1] == len(data.dt_cols)
+            assert values.base is not None  # a view, not an own copy
+            assert np.shares_memory(values, getattr(full, name).values)
+        # the dataframes are views of the same values
+        assert np.shares_memory(data.dft_cases_backfilled.values, full.cases.values)
+        assert np.shares_memory(data.dft_deaths.values, full.deaths.values)
+
+
+def test_offset_views_are_the_first_dates(covid_data):
+    full = covid_data(0)
+    data = covid_data(-30)
+    np.testing.assert_array_equal(data.cases.values,
+                                  full.cases.values[:, :len(data.dt_cols)])
+    assert list(data.cases.labels) == list(data.dt_cols)
+    assert (data.cases.dates == full.cases.dates[:len(data.dt_cols)]).all()
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import ReferenceData, SnapshotStore
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(SnapshotStore, 'enabled', True)
+    monkeypatch.setattr(SnapshotStore, 'folder', str(tmp_path / 'snapshots'))
+
+
+def test_snapshot_is_reused(covid_data, snapshots, set_owid, monkeypatch):
+    regions = covid_data().cases.regions
+    set_owid(np.arange(len(regions), dtype=float))
+    df = covid_data().overview_table_with_extra_data()
+
+    monkeypatch.setattr(covid_data, 'overview_table', lambda self: pytest.fail('recalculated'))
+    pd.testing.assert_frame_equal(covid_data().overview_table_with_extra_data(), df)
+
+
+def test_snapshot_updated_with_owid_data(covid_data, snapshots, set_owid):
+    regions = covid_data().cases.regions
+    set_owid(np.arange(len(regions), dtype=float))
+    before = covid_data().overview_table_with_extra_data()
+
+    set_owid(np.arange(len(regions), dtype=float) + 10)
+    after = covid_data().overview_table_with_extra_data()
+
+    np.testing.assert_allclose(after['owid_icu_per_100k'], before['owid_icu_per_100k'] + 1)
+
+
+def test_snapshot_updated_with_reference_data(covid_data, snapshots, set_owid, tmp_path,
+                                              monkeypatch):
+    set_owid(np.zeros(len(covid_data().cases.regions)))
+    source_paths = ReferenceData.source_paths()
+    copy = tmp_path / 'beds.csv'
+    copy.write_bytes(open(source_paths[1], 'rb').read())
+    monkeypatch.setattr(ReferenceData, 'source_paths', classmethod(
+        lambda cls: source_paths[:1] + [str(copy)] + source_paths[2:]))
+    overview_table = covid_data.overview_table
+    calls = []
+    monkeypatch.setattr(covid_data, 'overview_table',
+                        lambda self: calls.append(1) or overview_table(self))
+
+    covid_data().overview_table_with_extra_data()
+    covid_data().overview_table_with_extra_data()
+    assert len(calls) == 1
+    with open(copy, 'a') as f:
+        f.write('\n')
+    covid_data().overview_table_with_extra_data()
+    assert len(calls) == 2
+
+
+def stored(stage):
+    return sorted(name for name in os.listdir(SnapshotStore.folder) if name.startswith(stage))
+
+
+def test_older_snapshots_removed(covid_data, snapshots, set_owid):
+    regions = covid_data().cases.regions
+    set_owid(np.arange(len(regions), dtype=float))
+    covid_data().overview_table_with_extra_data()
+    covid_data(-1).overview_table_with_extra_data()
+    before = stored('overview')
+    assert len(before) == 2  # each offset has its own
+
+    set_owid(np.arange(len(regions), dtype=float) + 10)
+    covid_data().overview_table_with_extra_data()
+    after = stored('overview')
+    assert len(after) == 2
+    assert len(set(before) & set(after)) == 1  # the offset 0 output is replaced
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_helpers import CovidData, SourceData
+
+
+def biases_loop(deaths_dft, cases_dft, ifrs, death_lag, min_window_lag=60,
+                min_window_deaths=300):
+    """ the original (per country) implementation of CovidData.calculate_testing_biases_dft() """
+
+    def biases_vec(country: str) -> pd.Series:
+        d_vec = deaths_dft.loc[country].values
+        c_vec = cases_dft.loc[country].values
+        ifr = ifrs.loc[country]
+        left, right = death_lag, death_lag + min_window_lag
+        biases = np.ones_like(c_vec)
+
+        # short circuit and fallback if not enough data for windowed calculations
+        if d_vec[-1] < min_window_deaths:
+            if d_vec[-1] > 0:
+                biases[:] = (d_vec[-1] / c_vec[-1]) / ifr
+            else:
+                pass  # just return ones
+
+        else:
+            def diff_deaths(right, left):
+                return d_vec[right] - d_vec[left]
+
+            def diff_cases(right, left):
+                return c_vec[right - death_lag] - c_vec[left - death_lag]
+
+            while right <= (len(c_vec) - 1):
+                if ((right - left) < min_window_lag or
+                        diff_deaths(right, left) < min_window_deaths):
+                    # grow window to the right if needed
+                    right += 1
+                    continue
+
+                while ((right - left) > min_window_lag and
+                       diff_deaths(right, left) > min_window_deaths):
+                    # shrink window from the left if possible
+                    left += 1
+
+                biases[right] = ((diff_deaths(right, left) / diff_cases(right, left))
+                                 / ifr)
+                # advance left every time to prevent infinite loop
+                left += 1
+
+            # use first non 1 (initialised) value to fill the initial values
+            fill_ind = np.where(biases != 1)[0][0]
+            biases[:fill_ind] = biases[fill_ind]
+
+        return pd.Series(biases, index=cases_dft.columns)
+
+    testing_biases_dft = ifrs.index.to_series().apply(biases_vec)
+    testing_biases_dft[testing_biases_dft < 1] = 1
+    return testing_biases_dft
+
+
+@pytest.fixture
+def revised_data(jhu_frames, tmp_path, monkeypatch):
+    """ CovidData loaded with frames in which some death totals are revised down """
+    monkeypatch.setattr(CovidData, 'state_folder', str(tmp_path / 'covid_state'))
+    deaths = jhu_frames['deaths'].copy()
+    dt_cols = SourceData.get_dates(deaths)
+    rng = np.random.default_rng(2)
+    for row in rng.choice(len(deaths), 15, replace=False):
+        col = rng.integers(len(dt_cols) // 2, len(dt_cols))
+        # a lasting correction, or a one day dip
+        revised = dt_cols[col:] if row % 2 else dt_cols[col:col + 1]
+        deaths.loc[row, revised] = (deaths.loc[row, revised] - rng.integers(5, 50)).clip(0)
+    return CovidData.load({'confirmed': jhu_frames['confirmed'], 'deaths': deaths})
+
+
+@pytest.mark.parametrize('min_window_lag, min_window_deaths', [(60, 300), (20, 100), (5, 20)])
+@pytest.mark.parametrize('offset', [0, -30])
+def test_testing_biases_match_loop(revised_data, offset, min_window_lag, min_window_deaths):
+    data = revised_data(offset)
+    deaths_dft, cases_dft = data.dft_deaths, data.dft_cases_backfilled
+    assert (deaths_dft.diff(axis=1) < 0).values.any()  # has revisions
+    ifrs = pd.Series(np.random.default_rng(3).uniform(0.002, 0.02, len(deaths_dft)),
+                     index=deaths_dft.index)
+
+    expected = biases_loop(deaths_dft, cases_dft, ifrs, data.death_lag,
+                           min_window_lag, min_window_deaths)
+    actual = data.calculate_testing_biases_dft(ifrs, min_window_lag, min_window_deaths)
+
+    pd.testing.assert_frame_equal(actual, expected, check_names=False)